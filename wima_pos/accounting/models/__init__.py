@@ -1,6 +1,7 @@
 
 
 from . import account_account
+from . import account_auto_reconcile_job
 from . import account_bank_statement
 from . import account_chart_template
 from . import account_fiscal_year
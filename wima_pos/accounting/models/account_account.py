@@ -5,6 +5,22 @@ from odoo import models
 class AccountAccount(models.Model):
     _inherit = "account.account"
 
+    def write(self, vals):
+        if 'reconcile' in vals:
+            toggled_accounts = self.filtered(lambda account: account.reconcile != vals['reconcile'])
+        else:
+            toggled_accounts = self.browse()
+        res = super().write(vals)
+        if toggled_accounts:
+            # The invoice matching only proposes the journal items of reconcilable accounts.
+            lines = self.env['account.move.line'].search([
+                ('account_id', 'in', toggled_accounts.ids),
+                ('parent_state', '=', 'posted'),
+                ('full_reconcile_id', '=', False),
+            ])
+            self.env['account.move.line']._refresh_lines_reference_tokens(lines)
+        return res
+
     def action_open_reconcile(self):
         self.ensure_one()
         # Open reconciliation view for this account
@@ -1,4 +1,6 @@
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
+from datetime import timedelta
+
 from psycopg2 import sql
 
 from odoo import models, fields, api, osv
@@ -88,10 +90,10 @@ class AccountReport(models.AbstractModel):
             ]
 
     @api.model
-    def _prepare_lines_for_analytic_groupby(self):
+    def _prepare_lines_for_analytic_groupby(self, company_ids=None, date_from=None, date_to=None):
         """Prepare the analytic_temp_account_move_line
 
-        This method should be used once before all the SQL queries using the
+        This method should be used before all the SQL queries using the
         table account_move_line for the analytic columns for the financial reports.
         It will create a new table with the schema of account_move_line table, but with
         the data from account_analytic_line.
@@ -100,12 +102,93 @@ class AccountReport(models.AbstractModel):
         account_move_line fields and account_analytic_line fields and put NULL for those
         who don't exist in account_analytic_line.
         We also drop the NOT NULL constraints for fields who are not required in account_analytic_line.
+
+        Only the analytic lines of the given companies and dates are copied. The loaded bounds are kept per company
+        in analytic_temp_account_move_line_bounds, so that a later query needing a wider range (e.g. an initial balance)
+        only copies the missing lines.
+
+        :param company_ids: The companies whose lines are needed, the current companies by default.
+        :param date_from:   The first date needed, or None if there is no lower bound.
+        :param date_to:     The last date needed, or None if there is no upper bound.
         """
         self.env.cr.execute(
             "SELECT 1 FROM information_schema.tables WHERE table_name='analytic_temp_account_move_line'")
-        if self.env.cr.fetchone():
-            return
+        table_exists = bool(self.env.cr.fetchone())
+        if not table_exists:
+            self._create_analytic_temp_account_move_line()
+
+        missing_slices = self._get_analytic_temp_missing_slices(company_ids or self.env.companies.ids, fields.Date.to_date(date_from), fields.Date.to_date(date_to))
+        if missing_slices:
+            insert_query = self._get_analytic_temp_insert_query()
+            for company_id, slice_date_from, slice_date_to in missing_slices:
+                self.env.cr.execute(insert_query, [company_id, slice_date_from, slice_date_from, slice_date_to, slice_date_to])
+
+        if not table_exists:
+            # Indexes are only created after the first load, the following ones being much smaller.
+            self.env.cr.execute("""
+                CREATE INDEX ON analytic_temp_account_move_line (account_id, date, company_id);
+                ANALYZE analytic_temp_account_move_line;
+            """)
+
+    @api.model
+    def _create_analytic_temp_account_move_line(self):
+        """ Create the empty analytic_temp_account_move_line table, as well as the table keeping track of its loaded bounds. """
+        self.env.cr.execute("""
+            -- Create a temporary table, dropping not null constraints because we're not filling those columns
+            CREATE TEMPORARY TABLE IF NOT EXISTS analytic_temp_account_move_line () inherits (account_move_line) ON COMMIT DROP;
+            ALTER TABLE analytic_temp_account_move_line NO INHERIT account_move_line;
+            ALTER TABLE analytic_temp_account_move_line ALTER COLUMN move_id DROP NOT NULL;
+            ALTER TABLE analytic_temp_account_move_line ALTER COLUMN currency_id DROP NOT NULL;
+
+            CREATE TEMPORARY TABLE IF NOT EXISTS analytic_temp_account_move_line_bounds (
+                company_id INTEGER PRIMARY KEY,
+                date_from DATE,
+                date_to DATE
+            ) ON COMMIT DROP;
+        """)
+
+    @api.model
+    def _get_analytic_temp_missing_slices(self, company_ids, date_from, date_to):
+        """ Compare the requested bounds with the ones already loaded in analytic_temp_account_move_line and update them.
+
+        :return: A list of (company_id, date_from, date_to) slices to copy, a None date meaning no bound.
+        """
+        self.env.cr.execute("SELECT company_id, date_from, date_to FROM analytic_temp_account_move_line_bounds WHERE company_id IN %s", [tuple(company_ids)])
+        loaded_bounds = {company_id: (loaded_from, loaded_to) for company_id, loaded_from, loaded_to in self.env.cr.fetchall()}
+
+        missing_slices = []
+        new_bounds = []
+        for company_id in company_ids:
+            if company_id not in loaded_bounds:
+                missing_slices.append((company_id, date_from, date_to))
+                new_bounds.append((company_id, date_from, date_to))
+                continue
+
+            loaded_from, loaded_to = loaded_bounds[company_id]
+            if loaded_from and (not date_from or date_from < loaded_from):
+                missing_slices.append((company_id, date_from, loaded_from - timedelta(days=1)))
+            if loaded_to and (not date_to or date_to > loaded_to):
+                missing_slices.append((company_id, loaded_to + timedelta(days=1), date_to))
+            new_bounds.append((
+                company_id,
+                loaded_from and date_from and min(loaded_from, date_from),
+                loaded_to and date_to and max(loaded_to, date_to),
+            ))
+
+        if missing_slices:
+            self.env.cr.execute_values("""
+                INSERT INTO analytic_temp_account_move_line_bounds (company_id, date_from, date_to)
+                VALUES %s
+                ON CONFLICT (company_id) DO UPDATE SET date_from = EXCLUDED.date_from, date_to = EXCLUDED.date_to
+            """, new_bounds)
+
+        return missing_slices
 
+    @api.model
+    def _get_analytic_temp_insert_query(self):
+        """ Returns the query copying the analytic lines of one company between two (optional) dates into
+        analytic_temp_account_move_line. Its parameters are the company id, then date_from and date_to, each twice.
+        """
         line_fields = self.env['account.move.line'].fields_get()
         self.env.cr.execute("SELECT column_name FROM information_schema.columns WHERE table_name='account_move_line'")
         stored_fields = set(f[0] for f in self.env.cr.fetchall() if f[0] in line_fields)
@@ -152,28 +235,36 @@ class AccountReport(models.AbstractModel):
                 ))
 
         query = sql.SQL("""
-            -- Create a temporary table, dropping not null constraints because we're not filling those columns
-            CREATE TEMPORARY TABLE IF NOT EXISTS analytic_temp_account_move_line () inherits (account_move_line) ON COMMIT DROP;
-            ALTER TABLE analytic_temp_account_move_line NO INHERIT account_move_line;
-            ALTER TABLE analytic_temp_account_move_line ALTER COLUMN move_id DROP NOT NULL;
-            ALTER TABLE analytic_temp_account_move_line ALTER COLUMN currency_id DROP NOT NULL;
-
             INSERT INTO analytic_temp_account_move_line ({all_fields})
             SELECT {table}
-            FROM (SELECT * FROM account_analytic_line WHERE general_account_id IS NOT NULL) AS account_analytic_line
+            FROM (
+                SELECT *
+                FROM account_analytic_line
+                WHERE general_account_id IS NOT NULL
+                AND company_id = %s
+                AND (%s::date IS NULL OR date >= %s::date)
+                AND (%s::date IS NULL OR date <= %s::date)
+            ) AS account_analytic_line
         """).format(
             all_fields=sql.SQL(', ').join(sql.Identifier(fname) for fname in stored_fields),
             table=sql.SQL(', ').join(selected_fields),
         )
 
         # TODO gawa need to do the auditing of the lines
-        # TODO gawa try to reduce query on analytic lines
 
-        self.env.cr.execute(query)
+        return query
 
     def _query_get(self, options, date_scope, domain=None):
         # Override to add the context key which will eventually trigger the shadowing of the table
         context_self = self.with_context(account_report_analytic_groupby=options.get('analytic_groupby_option'))
+        if options.get('analytic_groupby_option'):
+            # Only the analytic lines within the bounds of this query need to be shadowed
+            date_from, date_to, allow_include_initial_balance = self._get_date_bounds_info(options, date_scope)
+            context_self = context_self.with_context(account_report_analytic_groupby_bounds={
+                'company_ids': [company['id'] for company in options.get('companies', [])],
+                'date_from': None if allow_include_initial_balance else date_from,
+                'date_to': date_to,
+            })
 
         # We add the domain filter for analytic_distribution here, as the search is not available
         tables, where_clause, where_params = super(AccountReport, context_self)._query_get(options, date_scope, domain)
@@ -264,6 +355,6 @@ class AccountMoveLine(models.Model):
         """
         query = super()._where_calc(domain, active_test)
         if self.env.context.get('account_report_analytic_groupby'):
-            self.env['account.report']._prepare_lines_for_analytic_groupby()
+            self.env['account.report']._prepare_lines_for_analytic_groupby(**self.env.context.get('account_report_analytic_groupby_bounds', {}))
             query._tables['account_move_line'] = SQL.identifier('analytic_temp_account_move_line')
         return query
@@ -637,6 +637,12 @@ class AccountAsset(models.Model):
 
         return depreciation_move_values
 
+    def _compute_and_post_depreciations(self):
+        """Compute the depreciation board of the assets not having any yet, and post all their depreciations."""
+        self.filtered(lambda asset: not asset.depreciation_move_ids).compute_depreciation_board()
+        self._check_depreciations()
+        self.depreciation_move_ids.filtered(lambda move: move.state != 'posted')._post()
+
     def _get_end_period_date(self, start_depreciation_date):
         """Get the end of the period in which the depreciation is posted.
 
@@ -791,14 +797,23 @@ class AccountAsset(models.Model):
             asset.message_post(body=asset_name[0], tracking_value_ids=tracking_value_ids)
             for move_id in asset.original_move_line_ids.mapped('move_id'):
                 move_id.message_post(body=msg)
-            try:
-                if not asset.depreciation_move_ids:
-                    asset.compute_depreciation_board()
-                asset._check_depreciations()
-                asset.depreciation_move_ids.filtered(lambda move: move.state != 'posted')._post()
-            except psycopg2.errors.CheckViolation:
-                raise ValidationError(_("Atleast one asset (%s) couldn't be set as running because it lacks any required information", asset.name))
 
+        # Compute the boards and post the depreciations of all the assets at once
+        try:
+            with self.env.cr.savepoint():
+                self._compute_and_post_depreciations()
+        except psycopg2.errors.CheckViolation:
+            # Process the assets one by one to only report the ones lacking information
+            faulty_assets = self.browse()
+            for asset in self:
+                try:
+                    with self.env.cr.savepoint():
+                        asset._compute_and_post_depreciations()
+                except psycopg2.errors.CheckViolation:
+                    faulty_assets |= asset
+            raise ValidationError(_("Atleast one asset (%s) couldn't be set as running because it lacks any required information", ', '.join((faulty_assets or self).mapped('name'))))
+
+        for asset in self:
             if asset.account_asset_id.create_asset == 'no':
                 asset._post_non_deductible_tax_value()
 
@@ -23,7 +23,7 @@ class AssetsReportCustomHandler(models.AbstractModel):
         }
 
     def _dynamic_lines_generator(self, report, options, all_column_groups_expression_totals, warnings=None):
-        report = self._with_context_company2code2account(report)
+        report = self._with_context_company2code2account(report, options)
 
         lines, totals_by_column_group = self._generate_report_lines_without_grouping(report, options)
         # add the groups by account
@@ -57,9 +57,16 @@ class AssetsReportCustomHandler(models.AbstractModel):
         #   {(account_id, asset_id): {col_group_key: {expression_label_1: value, expression_label_2: value, ...}}}
         all_asset_ids = set()
         all_lines_data = {}
-        for column_group_key, column_group_options in report._split_options_per_column_group(options).items():
+        options_by_column_group = report._split_options_per_column_group(options)
+        asset_lines_by_column_group = self._query_values_by_column_group(options_by_column_group, prefix_to_match=prefix_to_match, forced_account_id=forced_account_id)
+        for column_group_key, column_group_options in options_by_column_group.items():
             # the lines returned are already sorted by account_id!
-            lines_query_results = self._query_lines(column_group_options, prefix_to_match=prefix_to_match, forced_account_id=forced_account_id)
+            lines_query_results = self._query_lines(
+                column_group_options,
+                prefix_to_match=prefix_to_match,
+                forced_account_id=forced_account_id,
+                asset_lines=asset_lines_by_column_group[column_group_key],
+            )
             for account_id, asset_id, cols_by_expr_label in lines_query_results:
                 line_id = (account_id, asset_id)
                 all_asset_ids.add(asset_id)
@@ -154,22 +161,25 @@ class AssetsReportCustomHandler(models.AbstractModel):
         hierarchy_activated = (previous_options or {}).get('hierarchy', True)
         options['hierarchy'] = has_account_group and hierarchy_activated or False
 
-    def _with_context_company2code2account(self, report):
+    def _with_context_company2code2account(self, report, options):
         if self.env.context.get('company2code2account') is not None:
             return report
 
         company2code2account = defaultdict(dict)
-        for account in self.env['account.account'].search([]):
+        for account in self.env['account.account'].search([('company_id', 'in', report.get_report_company_ids(options))]):
             company2code2account[account.company_id.id][account.code] = account
 
         return report.with_context(company2code2account=company2code2account)
 
-    def _query_lines(self, options, prefix_to_match=None, forced_account_id=None):
+    def _query_lines(self, options, prefix_to_match=None, forced_account_id=None, asset_lines=None):
         """
         Returns a list of tuples: [(asset_id, account_id, [{expression_label: value}])]
+
+        :param asset_lines: The result of _query_values for these options, if already fetched.
         """
         lines = []
-        asset_lines = self._query_values(options, prefix_to_match=prefix_to_match, forced_account_id=forced_account_id)
+        if asset_lines is None:
+            asset_lines = self._query_values(options, prefix_to_match=prefix_to_match, forced_account_id=forced_account_id)
 
         # Assign the gross increases sub assets to their main asset (parent)
         parent_lines = []
@@ -336,15 +346,33 @@ class AssetsReportCustomHandler(models.AbstractModel):
 
     def _query_values(self, options, prefix_to_match=None, forced_account_id=None):
         "Get the data from the database"
+        return self._query_values_by_column_group({'': options}, prefix_to_match=prefix_to_match, forced_account_id=forced_account_id)['']
+
+    def _query_values_by_column_group(self, options_by_column_group, prefix_to_match=None, forced_account_id=None):
+        """ Get the data from the database for all the column groups at once.
+
+        The depreciation moves are aggregated once per asset and period, the periods being the date ranges of the
+        column groups, instead of joining all the moves of every asset again for each column group.
 
+        :param options_by_column_group: A dictionary mapping each column group key to its options, as returned by
+                                        _split_options_per_column_group. Only the dates may differ between them.
+        :return: A dictionary mapping each column group key to the list of values of its assets.
+        """
         self.env['account.move.line'].check_access_rights('read')
         self.env['account.asset'].check_access_rights('read')
 
+        options = next(iter(options_by_column_group.values()))
         move_filter = f"""move.state {"!= 'cancel'" if options.get('all_entries') else "= 'posted'"}"""
 
+        periods_query = ', '.join(
+            self._cr.mogrify(
+                '(%s, %s::date, %s::date)',
+                [column_group_key, column_group_options['date']['date_from'], column_group_options['date']['date_to']],
+            ).decode(self._cr.connection.encoding)
+            for column_group_key, column_group_options in options_by_column_group.items()
+        )
+
         query_params = {
-            'date_to': options['date']['date_to'],
-            'date_from': options['date']['date_from'],
             'company_ids': tuple(self.env['account.report'].get_report_company_ids(options)),
             'include_draft': options.get('all_entries', False),
         }
@@ -370,13 +398,30 @@ class AssetsReportCustomHandler(models.AbstractModel):
             query_params['analytic_account_ids'] = analytic_account_ids
 
         sql = f"""
-            SELECT asset.id AS asset_id,
+            WITH period(column_group_key, date_from, date_to) AS (VALUES {periods_query}),
+                 asset_move AS (
+                    SELECT move.asset_id,
+                           period.column_group_key,
+                           MIN(move.date) AS asset_date,
+                           BOOL_OR(move.date <= period.date_to) AS has_move_before_date_to,
+                           COALESCE(SUM(move.depreciation_value) FILTER (WHERE move.date < period.date_from AND {move_filter}), 0) AS depreciated_before,
+                           COALESCE(SUM(move.depreciation_value) FILTER (WHERE move.date BETWEEN period.date_from AND period.date_to AND {move_filter}), 0) AS depreciated_during,
+                           COALESCE(SUM(move.depreciation_value) FILTER (WHERE move.date BETWEEN period.date_from AND period.date_to AND {move_filter} AND move.asset_number_days IS NULL), 0) AS asset_disposal_value
+                      FROM account_move move
+                      JOIN account_asset asset ON asset.id = move.asset_id
+                CROSS JOIN period
+                     WHERE asset.company_id in %(company_ids)s
+                       AND NOT EXISTS (SELECT 1 FROM account_move reversal WHERE reversal.reversed_entry_id = move.id)
+                  GROUP BY move.asset_id, period.column_group_key
+                 )
+            SELECT period.column_group_key,
+                   asset.id AS asset_id,
                    asset.parent_id AS parent_id,
                    asset.name AS asset_name,
                    asset.original_value AS asset_original_value,
                    asset.currency_id AS asset_currency_id,
                    COALESCE(asset.salvage_value, 0) as asset_salvage_value,
-                   MIN(move.date) AS asset_date,
+                   asset_move.asset_date,
                    asset.disposal_date AS asset_disposal_date,
                    asset.acquisition_date AS asset_acquisition_date,
                    asset.method AS asset_method,
@@ -388,28 +433,28 @@ class AssetsReportCustomHandler(models.AbstractModel):
                    account.code AS account_code,
                    account.name AS account_name,
                    account.id AS account_id,
-                   COALESCE(SUM(move.depreciation_value) FILTER (WHERE move.date < %(date_from)s AND {move_filter}), 0) + COALESCE(asset.already_depreciated_amount_import, 0) AS depreciated_before,
-                   COALESCE(SUM(move.depreciation_value) FILTER (WHERE move.date BETWEEN %(date_from)s AND %(date_to)s AND {move_filter}), 0) AS depreciated_during,
-                   COALESCE(SUM(move.depreciation_value) FILTER (WHERE move.date BETWEEN %(date_from)s AND %(date_to)s AND {move_filter} AND move.asset_number_days IS NULL), 0) AS asset_disposal_value
+                   COALESCE(asset_move.depreciated_before, 0) + COALESCE(asset.already_depreciated_amount_import, 0) AS depreciated_before,
+                   COALESCE(asset_move.depreciated_during, 0) AS depreciated_during,
+                   COALESCE(asset_move.asset_disposal_value, 0) AS asset_disposal_value
               FROM account_asset AS asset
+        CROSS JOIN period
          LEFT JOIN account_account AS account ON asset.account_asset_id = account.id
-         LEFT JOIN account_move move ON move.asset_id = asset.id
-         LEFT JOIN account_move reversal ON reversal.reversed_entry_id = move.id
+         LEFT JOIN asset_move ON asset_move.asset_id = asset.id AND asset_move.column_group_key = period.column_group_key
              WHERE asset.company_id in %(company_ids)s
-               AND (asset.acquisition_date <= %(date_to)s OR move.date <= %(date_to)s)
-               AND (asset.disposal_date >= %(date_from)s OR asset.disposal_date IS NULL)
+               AND (asset.acquisition_date <= period.date_to OR asset_move.has_move_before_date_to)
+               AND (asset.disposal_date >= period.date_from OR asset.disposal_date IS NULL)
                AND (asset.state not in ('model', 'draft', 'cancelled') OR (asset.state = 'draft' AND %(include_draft)s))
                AND asset.active = 't'
-               AND reversal.id IS NULL
                {prefix_query}
                {account_query}
                {analytical_query}
-          GROUP BY asset.id, account.id
           ORDER BY account.code, asset.acquisition_date;
         """
 
         self._cr.execute(sql, query_params)
-        results = self._cr.dictfetchall()
+        results = {column_group_key: [] for column_group_key in options_by_column_group}
+        for row in self._cr.dictfetchall():
+            results[row.pop('column_group_key')].append(row)
         return results
 
     def _report_expand_unfoldable_line_assets_report_prefix_group(self, line_dict_id, groupby, options, progress, offset, unfold_all_batch_data=None):
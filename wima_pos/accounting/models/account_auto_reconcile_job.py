@@ -0,0 +1,82 @@
+import logging
+
+from odoo import api, Command, fields, models, _
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountAutoReconcileJob(models.Model):
+    """ An auto-reconciliation launched in background from the account.auto.reconcile.wizard, waiting to be processed by
+    the CRON. Unlike the wizard, it is not removed by the transient models cleanup while waiting. The job is deleted once
+    processed, or kept with the error if it failed.
+    """
+    _name = 'account.auto.reconcile.job'
+    _description = 'Account automatic reconciliation launched in background'
+    _order = 'id'
+
+    company_id = fields.Many2one(comodel_name='res.company', required=True, readonly=True)
+    line_ids = fields.Many2many(comodel_name='account.move.line')
+    from_date = fields.Date(string='From')
+    to_date = fields.Date(string='To', required=True)
+    account_ids = fields.Many2many(comodel_name='account.account', string='Accounts')
+    partner_ids = fields.Many2many(comodel_name='res.partner', string='Partners')
+    search_mode = fields.Selection(
+        selection=[
+            ('one_to_one', 'Opposite balances one by one'),
+            ('zero_balance', 'Accounts with zero balances'),
+        ],
+        string='Reconcile',
+        required=True,
+    )
+    state = fields.Selection(
+        selection=[
+            ('pending', 'Pending'),
+            ('running', 'Running'),
+            ('failed', 'Failed'),
+        ],
+        required=True,
+        default='pending',
+    )
+    error_message = fields.Text(readonly=True)
+
+    def _get_wizard_values(self):
+        """ Get the values of the account.auto.reconcile.wizard performing the job. """
+        self.ensure_one()
+        return {
+            'company_id': self.company_id.id,
+            'line_ids': [Command.set(self.line_ids.ids)],
+            'account_ids': [Command.set(self.account_ids.ids)],
+            'partner_ids': [Command.set(self.partner_ids.ids)],
+            'search_mode': self.search_mode,
+            'from_date': self.from_date,
+            'to_date': self.to_date,
+        }
+
+    @api.model
+    def _cron_auto_reconcile(self):
+        """ Method called by the CRON to reconcile the amls of the jobs launched in background.
+
+        The running jobs are the ones interrupted during a previous run, e.g. when the worker has been killed. They are
+        processed again, the batches already committed being skipped since their amls are reconciled.
+        """
+        for job in self.search([('state', 'in', ('pending', 'running'))]):
+            job.state = 'running'
+            self.env.cr.commit()
+            try:
+                wizard = self.env['account.auto.reconcile.wizard']\
+                    .with_user(job.create_uid)\
+                    .with_company(job.company_id)\
+                    .create(job._get_wizard_values())
+                wizard._auto_reconcile_amls(commit=True)
+            except Exception as error:
+                self.env.cr.rollback()
+                _logger.exception("Auto-reconciliation job %s failed.", job.id)
+                job.write({'state': 'failed', 'error_message': str(error)})
+                self.env['mail.thread'].sudo().message_notify(
+                    partner_ids=job.create_uid.partner_id.ids,
+                    subject=_("Automatic reconciliation failed"),
+                    body=_("The entries launched in background couldn't be reconciled automatically: %s", error),
+                )
+            else:
+                job.unlink()
+            self.env.cr.commit()
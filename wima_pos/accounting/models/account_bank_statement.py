@@ -1,6 +1,9 @@
+import logging
+
 from odoo import _, api, fields, models
 from odoo.addons.base.models.res_bank import sanitize_account_number
 from odoo.exceptions import UserError
+from odoo.osv import expression
 from odoo.tools import html2plaintext
 
 from dateutil.relativedelta import relativedelta
@@ -8,6 +11,13 @@ from itertools import product
 from lxml import etree
 from markupsafe import Markup
 
+_logger = logging.getLogger(__name__)
+
+# Number of scheduled actions sharing the auto-reconciliation of the statement lines, each one processing the journals
+# whose id modulo AUTO_RECONCILE_SHARD_COUNT is its shard index. See data/ir_cron.xml.
+AUTO_RECONCILE_SHARD_COUNT = 4
+
+
 class AccountBankStatement(models.Model):
     _inherit = 'account.bank.statement'
 
@@ -92,13 +102,22 @@ class AccountBankStatementLine(models.Model):
             },
         )
 
-    def _cron_try_auto_reconcile_statement_lines(self, batch_size=None, limit_time=0):
+    def _cron_try_auto_reconcile_statement_lines(self, batch_size=None, limit_time=0, auto_commit=False, shard_index=None):
         """ Method called by the CRON to reconcile the statement lines automatically.
 
+        The statement lines are split by journal between AUTO_RECONCILE_SHARD_COUNT scheduled actions, so that they are
+        processed in parallel by as many cron workers. The statement lines are also claimed with FOR UPDATE SKIP LOCKED,
+        so that concurrent runs (a CRON and a manual run_auto_reconciliation for instance) process different statement
+        lines instead of waiting for each other.
+
         :param  batch_size:  The maximum number of statement lines that could be processed at once by the CRON to avoid
                             a timeout. If specified, the CRON will be trigger again asap using a CRON trigger in case
                             there is still some statement lines to process.
                 limit_time: Maximum time allowed to run in seconds. 0 if the Cron is allowed to run without time limit.
+                auto_commit: Commit after each batch of batch_size statement lines. In any case, the batches are
+                            claimed one after the other until there is no statement line left or limit_time is reached.
+                shard_index: Only process the journals whose id modulo AUTO_RECONCILE_SHARD_COUNT is shard_index. None
+                            to process all of them.
         """
         def _compute_st_lines_to_reconcile(configured_company):
             # Find the bank statement lines that are not reconciled and try to reconcile them automatically.
@@ -109,11 +128,19 @@ class AccountBankStatementLine(models.Model):
                 ('is_reconciled', '=', False),
                 ('create_date', '>', start_time.date() - relativedelta(months=3)),
                 ('company_id', 'in', configured_company.ids),
+                # Don't process twice the statement lines of a previous batch of this run.
+                '|', ('cron_last_check', '=', False), ('cron_last_check', '<', start_time),
             ]
             query_obj = self._search(domain, limit=limit)
+            if shard_index is not None:
+                query_obj.add_where(
+                    'MOD("account_bank_statement_line"."journal_id", %s) = %s',
+                    [AUTO_RECONCILE_SHARD_COUNT, shard_index],
+                )
             query_obj.order = '"account_bank_statement_line"."cron_last_check" ASC NULLS FIRST,"account_bank_statement_line"."id"'
             query_str, query_params = query_obj.select('account_bank_statement_line.id')
-            self._cr.execute(query_str, query_params)
+            # Skip the statement lines being processed by another run.
+            self._cr.execute(f'{query_str} FOR UPDATE OF "account_bank_statement_line" SKIP LOCKED', query_params)
             st_line_ids = [r[0] for r in self._cr.fetchall()]
             if batch_size and len(st_line_ids) > batch_size:
                 remaining_line_id = st_line_ids[batch_size]
@@ -139,85 +166,220 @@ class AccountBankStatementLine(models.Model):
         while children_company := children_company.child_ids:
             configured_company += children_company
 
-        self.env['account.bank.statement.line'].flush_model()
-        # we either already have statement lines to reconcile or compute them
-        st_lines, remaining_line_id = (self, None) if self else _compute_st_lines_to_reconcile(configured_company)
-
         nb_auto_reconciled_lines = 0
-        for index, st_line in enumerate(st_lines):
-            # we want the cron to run only for limit_time seconds
-            if limit_time and fields.Datetime.now().timestamp() - start_time.timestamp() > limit_time:
-                remaining_line_id = st_line.id
-                st_lines = st_lines[:index]
+        nb_processed_lines = 0
+        matchings = {}
+        used_aml_ids = set()
+        wizards_to_validate = self.env['bank.rec.widget']
+        is_triggered = False
+
+        def _validate_wizards(wizards):
+            # Validate the statement lines all at once. If a statement line can't be validated, fallback on validating
+            # them one by one to skip only the faulty ones.
+            st_lines = wizards.st_line_id
+            try:
+                with self.env.cr.savepoint():
+                    wizards._action_validate()
+            except UserError:
+                # The cache is no longer reliable after the rollback, the widgets are rebuilt from scratch.
+                self.env.invalidate_all()
+                for st_line in st_lines:
+                    wizard = self.env['bank.rec.widget'].with_context(default_st_line_id=st_line.id).new({})
+                    wizard._action_trigger_matching_rules()
+                    if wizard.state != 'valid' or not wizard.matching_rules_allow_auto_reconcile:
+                        continue
+                    try:
+                        with self.env.cr.savepoint():
+                            wizard._action_validate()
+                    except UserError:
+                        self.env.invalidate_all()
+                        continue
+
+            nb_reconciled = 0
+            for st_line in st_lines:
+                if st_line.is_reconciled:
+                    st_line.move_id.message_post(body=_(
+                        "This bank transaction has been automatically validated using the reconciliation model '%s'.",
+                        ', '.join(st_line.move_id.line_ids.reconcile_model_id.mapped('name')),
+                    ))
+                    nb_reconciled += 1
+            return nb_reconciled
+
+        while True:
+            self.env['account.bank.statement.line'].flush_model()
+            # we either already have statement lines to reconcile or compute them
+            st_lines, remaining_line_id = (self, None) if self else _compute_st_lines_to_reconcile(configured_company)
+
+            time_limit_reached = False
+            for index, st_line in enumerate(st_lines):
+                # we want the cron to run only for limit_time seconds
+                if limit_time and fields.Datetime.now().timestamp() - start_time.timestamp() > limit_time:
+                    remaining_line_id = st_line.id
+                    st_lines = st_lines[:index]
+                    time_limit_reached = True
+                    break
+
+                # The reconciliation models are applied on the next statement lines at once, by batch of 100 so the time
+                # limit is still checked often enough.
+                if st_line.id not in matchings:
+                    matchings.update(self.env['account.reconcile.model']._apply_rules_batch(st_lines[index:index + 100]))
+                matching = matchings[st_line.id]
+                if matching.get('amls') and used_aml_ids.intersection(matching['amls'].ids):
+                    # Some candidates have been reconciled with a previous statement line, their residual amount changed.
+                    # Validate the pending statement lines first so the rules are applied on up-to-date amounts.
+                    if wizards_to_validate:
+                        nb_auto_reconciled_lines += _validate_wizards(wizards_to_validate)
+                        wizards_to_validate = self.env['bank.rec.widget']
+                    matching = None
+
+                wizard = self.env['bank.rec.widget'].with_context(default_st_line_id=st_line.id).new({})
+                wizard._action_trigger_matching_rules(matching=matching)
+                if wizard.state == 'valid' and wizard.matching_rules_allow_auto_reconcile:
+                    used_aml_ids.update(wizard.line_ids.source_aml_id.ids)
+                    wizards_to_validate |= wizard
+
+            if wizards_to_validate:
+                nb_auto_reconciled_lines += _validate_wizards(wizards_to_validate)
+                wizards_to_validate = self.env['bank.rec.widget']
+
+            st_lines.write({'cron_last_check': start_time})
+            nb_processed_lines += len(st_lines)
+
+            # If the next statement line has never been auto reconciled yet, force the trigger. It is done before
+            # committing the batch so the remaining statement lines are still processed asap if the worker is killed.
+            if remaining_line_id and not is_triggered:
+                remaining_st_line = self.env['account.bank.statement.line'].browse(remaining_line_id)
+                if nb_auto_reconciled_lines or not remaining_st_line.cron_last_check:
+                    self._trigger_auto_reconcile_crons(None if shard_index is None else [shard_index])
+                    is_triggered = True
+
+            if not remaining_line_id or time_limit_reached:
                 break
-            wizard = self.env['bank.rec.widget'].with_context(default_st_line_id=st_line.id).new({})
-            wizard._action_trigger_matching_rules()
-            if wizard.state == 'valid' and wizard.matching_rules_allow_auto_reconcile:
-                try:
-                    wizard._action_validate()
-                    if st_line.is_reconciled:
-                        st_line.move_id.message_post(body=_(
-                            "This bank transaction has been automatically validated using the reconciliation model '%s'.",
-                            ', '.join(st_line.move_id.line_ids.reconcile_model_id.mapped('name')),
-                        ))
-                        nb_auto_reconciled_lines += 1
-                except UserError:
-                    continue
-
-        st_lines.write({'cron_last_check': start_time})
-
-        # If the next statement line has never been auto reconciled yet, force the trigger.
-        if remaining_line_id:
-            remaining_st_line = self.env['account.bank.statement.line'].browse(remaining_line_id)
-            if nb_auto_reconciled_lines or not remaining_st_line.cron_last_check:
-                self.env.ref('wima_pos.auto_reconcile_bank_statement_line')._trigger()
+
+            # Commit each batch so that the work done is kept and its statement lines are released for the other runs.
+            # Without auto_commit, the next batch is still claimed only once this one is processed so the statement
+            # lines not reached yet are not locked.
+            if auto_commit:
+                self.env.cr.commit()
+            _logger.info(
+                "Auto-reconciliation of statement lines: %s lines processed, %s reconciled.",
+                nb_processed_lines, nb_auto_reconciled_lines,
+            )
+
+    @api.model
+    def _trigger_auto_reconcile_crons(self, shard_indexes=None):
+        """ Trigger the scheduled actions processing the given shards of statement lines, or all of them if None. """
+        if shard_indexes is None:
+            shard_indexes = range(AUTO_RECONCILE_SHARD_COUNT)
+        for shard_index in shard_indexes:
+            self.env.ref(f'wima_pos.auto_reconcile_bank_statement_line_shard_{shard_index}')._trigger()
 
     def _retrieve_partner(self):
         self.ensure_one()
+        return self._retrieve_partners()[self.id]
+
+    def _retrieve_partners(self):
+        """ Retrieve the partner of each statement line, from the statement line itself, its bank account number, its
+        partner name or the partner mapping of the reconcile models, in that order.
 
-        # Retrieve the partner from the statement line.
-        if self.partner_id:
-            return self.partner_id
+        The bank accounts are searched once for all the statement lines, while the searches on the partner name and
+        the reconcile models are shared by the statement lines having the same partner name or company.
 
+        :return: A dict mapping each statement line id with its partner, possibly an empty recordset.
+        """
         # Retrieve the partner from the bank account.
-        if self.account_number:
-            account_number_nums = sanitize_account_number(self.account_number)
+        partners_from_bank_account = self.filtered(lambda st_line: not st_line.partner_id)._retrieve_partners_from_bank_account()
+
+        partners_from_name = {}
+        rec_models_per_company = {}
+        results = {}
+        for st_line in self:
+            # Retrieve the partner from the statement line.
+            partner = st_line.partner_id or partners_from_bank_account.get(st_line.id)
+
+            # Retrieve the partner from the partner name.
+            if not partner and st_line.partner_name:
+                key = (st_line.partner_name, st_line.company_id)
+                if key not in partners_from_name:
+                    partners_from_name[key] = st_line._retrieve_partner_from_name()
+                partner = partners_from_name[key]
+
+            # Retrieve the partner from the 'reconcile models'.
+            if not partner:
+                company = st_line.company_id
+                if company not in rec_models_per_company:
+                    rec_models_per_company[company] = self.env['account.reconcile.model'].search([
+                        *self.env['account.reconcile.model']._check_company_domain(company),
+                        ('rule_type', '!=', 'writeoff_button'),
+                    ])
+                for rec_model in rec_models_per_company[company]:
+                    partner = rec_model._get_partner_from_mapping(st_line)
+                    if partner and rec_model._is_applicable_for(st_line, partner):
+                        break
+                else:
+                    partner = self.env['res.partner']
+
+            results[st_line.id] = partner
+        return results
+
+    def _retrieve_partners_from_bank_account(self):
+        """ Retrieve the partner owning the bank account of each statement line, with a single search of the bank
+        accounts of all the statement lines. A bank account whose sanitized number contains the one of the statement line
+        matches it, a bank account of the statement line's company being preferred.
+
+        :return: A dict mapping the id of each statement line whose partner was found with that partner.
+        """
+        account_numbers = {}
+        for st_line in self:
+            account_number_nums = sanitize_account_number(st_line.account_number) if st_line.account_number else None
             if account_number_nums:
-                domain = [('sanitized_acc_number', 'ilike', account_number_nums)]
-                for extra_domain in (self.env['res.partner.bank']._check_company_domain(self.company_id), []):
-                    bank_accounts = self.env['res.partner.bank'].search(extra_domain + domain)
-                    if len(bank_accounts.partner_id) == 1:
-                        return bank_accounts.partner_id
-
-        # Retrieve the partner from the partner name.
-        if self.partner_name:
-            # using 'complete_name' instead of 'name',
-            # as 'complete_name' is the first search criteria in _rec_names_search,
-            # and trigram indexed accordingly.
-            domains = product(
-                [
-                    ('complete_name', '=ilike', self.partner_name),
-                    ('complete_name', 'ilike', self.partner_name),
-                ],
-                [
-                    ('company_id', 'parent_of', self.company_id.id),
-                    ('company_id', '=', False),
-                ],
-            )
-            for domain in domains:
-                partner = self.env['res.partner'].search(list(domain) + [('parent_id', '=', False)], limit=1)
-                if partner:
-                    return partner
-        # Retrieve the partner from the 'reconcile models'.
-        rec_models = self.env['account.reconcile.model'].search([
-            *self.env['account.reconcile.model']._check_company_domain(self.company_id),
-            ('rule_type', '!=', 'writeoff_button'),
-        ])
-        for rec_model in rec_models:
-            partner = rec_model._get_partner_from_mapping(self)
-            if partner and rec_model._is_applicable_for(self, partner):
-                return partner
+                account_numbers[st_line] = account_number_nums
+        if not account_numbers:
+            return {}
+
+        bank_accounts = self.env['res.partner.bank'].search(expression.OR([
+            [('sanitized_acc_number', 'ilike', account_number_nums)]
+            for account_number_nums in set(account_numbers.values())
+        ]))
+
+        company_bank_accounts = {}
+        results = {}
+        for st_line, account_number_nums in account_numbers.items():
+            company = st_line.company_id
+            if company not in company_bank_accounts:
+                company_bank_accounts[company] = bank_accounts.search([
+                    *self.env['res.partner.bank']._check_company_domain(company),
+                    ('id', 'in', bank_accounts.ids),
+                ])
 
+            for candidates in (company_bank_accounts[company], bank_accounts):
+                matching_bank_accounts = candidates.filtered(
+                    lambda bank_account: account_number_nums.upper() in (bank_account.sanitized_acc_number or '').upper()
+                )
+                if len(matching_bank_accounts.partner_id) == 1:
+                    results[st_line.id] = matching_bank_accounts.partner_id
+                    break
+        return results
+
+    def _retrieve_partner_from_name(self):
+        self.ensure_one()
+        # using 'complete_name' instead of 'name',
+        # as 'complete_name' is the first search criteria in _rec_names_search,
+        # and trigram indexed accordingly.
+        domains = product(
+            [
+                ('complete_name', '=ilike', self.partner_name),
+                ('complete_name', 'ilike', self.partner_name),
+            ],
+            [
+                ('company_id', 'parent_of', self.company_id.id),
+                ('company_id', '=', False),
+            ],
+        )
+        for domain in domains:
+            partner = self.env['res.partner'].search(list(domain) + [('parent_id', '=', False)], limit=1)
+            if partner:
+                return partner
         return self.env['res.partner']
 
     def _get_st_line_strings_for_matching(self, allowed_fields=None):
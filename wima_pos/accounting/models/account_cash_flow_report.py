@@ -53,6 +53,9 @@ class CashFlowReportCustomHandler(models.AbstractModel):
         tags_ids = self._get_tags_ids()
         cashflow_tag_ids = self._get_cashflow_tag_ids()
 
+        # Classify the liquidity moves once, both following queries rely on them.
+        self._prepare_liquidity_moves(report, options, payment_account_ids)
+
         # Process liquidity moves
         for aml_groupby_account in self._get_liquidity_moves(report, options, currency_table_query, payment_account_ids, cashflow_tag_ids):
             for aml_data in aml_groupby_account.values():
@@ -193,21 +196,51 @@ class CashFlowReportCustomHandler(models.AbstractModel):
 
         return tuple(payment_account_ids)
 
-    def _get_move_ids_query(self, report, payment_account_ids, column_group_options):
-        ''' Get all liquidity moves to be part of the cash flow statement.
-        :param payment_account_ids: A tuple containing all account.account's ids being used in a liquidity journal.
-        :return: query: The SQL query to retrieve the move IDs.
+    def _prepare_liquidity_moves(self, report, options, payment_account_ids):
+        ''' Fill the cash_flow_liquidity_move temporary table with the liquidity moves of each column group, i.e. the moves
+        having at least one line on a liquidity account in the period.
+
+        The table is indexed and analyzed so that the following queries use it as a plain semi-join, instead of each one
+        rediscovering these moves through an aggregated array.
+
+        :param options:                 The report options.
+        :param payment_account_ids:     A tuple containing all account.account's ids being used in a liquidity journal.
         '''
+        queries = []
+        params = []
+        for column_group_key, column_group_options in report._split_options_per_column_group(options).items():
+            tables, where_clause, where_params = report._query_get(column_group_options, 'strict_range', [('account_id', 'in', list(payment_account_ids))])
+            queries.append(f'''
+                SELECT DISTINCT
+                    %s::VARCHAR AS column_group_key,
+                    account_move_line.move_id
+                FROM {tables}
+                WHERE {where_clause}
+            ''')
+            params += [column_group_key, *where_params]
 
-        tables, where_clause, where_params = report._query_get(column_group_options, 'strict_range', [('account_id', 'in', list(payment_account_ids))])
-        query = f'''
-            SELECT
-                array_agg(DISTINCT account_move_line.move_id) AS move_id
-            FROM {tables}
-            WHERE {where_clause}
+        # The table is dropped and recreated at each call, so that it never holds the moves of other options computed
+        # earlier in the same transaction.
+        self._cr.execute(f'''
+            DROP TABLE IF EXISTS cash_flow_liquidity_move;
+            CREATE TEMPORARY TABLE cash_flow_liquidity_move ON COMMIT DROP AS
+                {' UNION ALL '.join(queries)};
+            CREATE INDEX ON cash_flow_liquidity_move (column_group_key, move_id);
+            ANALYZE cash_flow_liquidity_move;
+        ''', params)
+
+    def _get_move_ids_query(self, column_group_key):
+        ''' Get all liquidity moves to be part of the cash flow statement.
+        :param column_group_key: The column group for which the liquidity moves are retrieved.
+        :return: query: The SQL query to retrieve the move IDs, from the table filled by _prepare_liquidity_moves.
+        '''
+        query = '''
+            SELECT cash_flow_liquidity_move.move_id
+            FROM cash_flow_liquidity_move
+            WHERE cash_flow_liquidity_move.column_group_key = %s
         '''
 
-        return self.env.cr.mogrify(query, where_params).decode(self.env.cr.connection.encoding)
+        return self.env.cr.mogrify(query, [column_group_key]).decode(self.env.cr.connection.encoding)
 
     def _compute_liquidity_balance(self, report, options, currency_table_query, payment_account_ids, date_scope):
         ''' Compute the balance of all liquidity accounts to populate the following sections:
@@ -272,11 +305,10 @@ class CashFlowReportCustomHandler(models.AbstractModel):
             account_name = 'account_account.name'
 
         for column_group_key, column_group_options in report._split_options_per_column_group(options).items():
-            move_ids = self._get_move_ids_query(report, payment_account_ids, column_group_options)
+            move_ids = self._get_move_ids_query(column_group_key)
 
             queries.append(f'''
-                (WITH payment_move_ids AS ({move_ids})
-                -- Credit amount of each account
+                (-- Credit amount of each account
                 SELECT
                     %s AS column_group_key,
                     account_move_line.account_id,
@@ -295,7 +327,7 @@ class CashFlowReportCustomHandler(models.AbstractModel):
                 LEFT JOIN account_account_account_tag
                     ON account_account_account_tag.account_account_id = account_move_line.account_id
                     AND account_account_account_tag.account_account_tag_id IN %s
-                WHERE account_move_line.move_id IN (SELECT unnest(payment_move_ids.move_id) FROM payment_move_ids)
+                WHERE account_move_line.move_id IN ({move_ids})
                     AND account_move_line.account_id NOT IN %s
                     AND account_partial_reconcile.max_date BETWEEN %s AND %s
                 GROUP BY account_move_line.company_id, account_move_line.account_id, account_account.code, account_name, account_account.account_type, account_account_account_tag.account_account_tag_id
@@ -321,7 +353,7 @@ class CashFlowReportCustomHandler(models.AbstractModel):
                 LEFT JOIN account_account_account_tag
                     ON account_account_account_tag.account_account_id = account_move_line.account_id
                     AND account_account_account_tag.account_account_tag_id IN %s
-                WHERE account_move_line.move_id IN (SELECT unnest(payment_move_ids.move_id) FROM payment_move_ids)
+                WHERE account_move_line.move_id IN ({move_ids})
                     AND account_move_line.account_id NOT IN %s
                     AND account_partial_reconcile.max_date BETWEEN %s AND %s
                 GROUP BY account_move_line.company_id, account_move_line.account_id, account_account.code, account_name, account_account.account_type, account_account_account_tag.account_account_tag_id
@@ -345,7 +377,7 @@ class CashFlowReportCustomHandler(models.AbstractModel):
                 LEFT JOIN account_account_account_tag
                     ON account_account_account_tag.account_account_id = account_move_line.account_id
                     AND account_account_account_tag.account_account_tag_id IN %s
-                WHERE account_move_line.move_id IN (SELECT unnest(payment_move_ids.move_id) FROM payment_move_ids)
+                WHERE account_move_line.move_id IN ({move_ids})
                     AND account_move_line.account_id NOT IN %s
                 GROUP BY account_move_line.account_id, account_account.code, account_name, account_account.account_type, account_account_account_tag.account_account_tag_id)
             ''')
@@ -395,11 +427,10 @@ class CashFlowReportCustomHandler(models.AbstractModel):
         params = []
 
         for column_group_key, column_group_options in report._split_options_per_column_group(options).items():
-            move_ids = self._get_move_ids_query(report, payment_account_ids, column_group_options)
+            move_ids = self._get_move_ids_query(column_group_key)
 
             queries.append(f'''
-                (WITH payment_move_ids AS ({move_ids})
-                SELECT
+                (SELECT
                     %s AS column_group_key,
                     debit_line.move_id,
                     debit_line.account_id,
@@ -409,10 +440,15 @@ class CashFlowReportCustomHandler(models.AbstractModel):
                     ON account_partial_reconcile.credit_move_id = credit_line.id
                 INNER JOIN account_move_line AS debit_line
                     ON debit_line.id = account_partial_reconcile.debit_move_id
-                WHERE credit_line.move_id IN (SELECT unnest(payment_move_ids.move_id) FROM payment_move_ids)
+                WHERE credit_line.move_id IN ({move_ids})
                     AND credit_line.account_id NOT IN %s
                     AND credit_line.credit > 0.0
-                    AND debit_line.move_id NOT IN (SELECT unnest(payment_move_ids.move_id) FROM payment_move_ids)
+                    AND NOT EXISTS (
+                        SELECT 1
+                        FROM cash_flow_liquidity_move
+                        WHERE cash_flow_liquidity_move.column_group_key = %s
+                        AND cash_flow_liquidity_move.move_id = debit_line.move_id
+                    )
                     AND account_partial_reconcile.max_date BETWEEN %s AND %s
                 GROUP BY debit_line.move_id, debit_line.account_id
 
@@ -428,10 +464,15 @@ class CashFlowReportCustomHandler(models.AbstractModel):
                     ON account_partial_reconcile.debit_move_id = debit_line.id
                 INNER JOIN account_move_line AS credit_line
                     ON credit_line.id = account_partial_reconcile.credit_move_id
-                WHERE debit_line.move_id IN (SELECT unnest(payment_move_ids.move_id) FROM payment_move_ids)
+                WHERE debit_line.move_id IN ({move_ids})
                     AND debit_line.account_id NOT IN %s
                     AND debit_line.debit > 0.0
-                    AND credit_line.move_id NOT IN (SELECT unnest(payment_move_ids.move_id) FROM payment_move_ids)
+                    AND NOT EXISTS (
+                        SELECT 1
+                        FROM cash_flow_liquidity_move
+                        WHERE cash_flow_liquidity_move.column_group_key = %s
+                        AND cash_flow_liquidity_move.move_id = credit_line.move_id
+                    )
                     AND account_partial_reconcile.max_date BETWEEN %s AND %s
                 GROUP BY credit_line.move_id, credit_line.account_id)
             ''')
@@ -439,6 +480,7 @@ class CashFlowReportCustomHandler(models.AbstractModel):
             params += [
                 column_group_key,
                 payment_account_ids,
+                column_group_key,
                 column_group_options['date']['date_from'],
                 column_group_options['date']['date_to'],
             ] * 2
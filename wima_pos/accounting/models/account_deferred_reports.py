@@ -7,6 +7,7 @@ from odoo import models, fields, _, api, Command
 from odoo.exceptions import UserError
 from odoo.tools import groupby
 from odoo.addons.wima_pos.accounting.models.account_move import DEFERRED_DATE_MIN, DEFERRED_DATE_MAX
+from odoo.addons.wima_pos.accounting.models.account_move_line import DEFERRED_DATE_RANGE_SQL
 
 
 class DeferredReportCustomHandler(models.AbstractModel):
@@ -68,8 +69,38 @@ class DeferredReportCustomHandler(models.AbstractModel):
         ]
 
     def _get_lines(self, report, options, filter_already_generated=False):
-        domain = self._get_domain(report, options, filter_already_generated)
+        # The deferral filter of _get_domain is applied below with EXISTS subqueries on account_move_deferred_rel. As in
+        # the domain, a line is excluded when its move has a deferral move dated at the end of the period and a posted
+        # deferral move, not necessarily the same one.
+        domain = self._get_domain(report, options, False)
         query = self.env['account.move.line']._search(domain, order="deferred_start_date, id")
+        # Redundant with the domain, but allows using the deferred date range index of account.move.line
+        query.add_where(
+            f"{DEFERRED_DATE_RANGE_SQL} && daterange(%s, NULL, '[]')",
+            [options['date']['date_from']],
+        )
+        if filter_already_generated:
+            query.add_where(
+                """
+                    NOT (
+                        EXISTS (
+                            SELECT 1
+                              FROM account_move_deferred_rel deferred_rel
+                              JOIN account_move deferred_move ON deferred_move.id = deferred_rel.deferred_move_id
+                             WHERE deferred_rel.original_move_id = "account_move_line".move_id
+                               AND deferred_move.date = %s
+                        )
+                        AND EXISTS (
+                            SELECT 1
+                              FROM account_move_deferred_rel deferred_rel
+                              JOIN account_move deferred_move ON deferred_move.id = deferred_rel.deferred_move_id
+                             WHERE deferred_rel.original_move_id = "account_move_line".move_id
+                               AND deferred_move.state = 'posted'
+                        )
+                    )
+                """,
+                [options['date']['date_to']],
+            )
         query_str, params = query.select(*self._get_select())
         self.env.cr.execute(query_str, params)
         res = self.env.cr.dictfetchall()
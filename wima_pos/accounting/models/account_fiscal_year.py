@@ -53,3 +53,22 @@ class AccountFiscalYear(models.Model):
 
             if self.search_count(domain) > 0:
                 raise ValidationError(_('You can not have an overlap between two fiscal years, please correct the start and/or end dates of your fiscal years.'))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        fiscalyears = super().create(vals_list)
+        # Invalidate the fiscal years cached by res.company._get_fiscalyear_intervals
+        self.env.registry.clear_cache()
+        return fiscalyears
+
+    def write(self, vals):
+        res = super().write(vals)
+        # Only the dates and company are part of the cached fiscal years, e.g. renaming one keeps the cache.
+        if {'date_from', 'date_to', 'company_id'}.intersection(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
@@ -7,6 +7,7 @@ from odoo.addons.web.controllers.utils import clean_action
 from odoo.exceptions import UserError, RedirectWarning
 from odoo.osv import expression
 from odoo.tools.misc import get_lang
+from odoo.addons.wima_pos.accounting.models.account_move_line import TAX_DETAILS_TABLE
 
 
 class AccountTaxReportHandler(models.AbstractModel):
@@ -114,6 +115,7 @@ class AccountTaxReportHandler(models.AbstractModel):
                 closing_moves_by_company[company] = company_closing_moves
                 closing_moves += company_closing_moves
 
+        closing_vals_by_move = {}
         for company, company_closing_moves in closing_moves_by_company.items():
 
             # First gather the countries for which the closing is being done
@@ -128,21 +130,34 @@ class AccountTaxReportHandler(models.AbstractModel):
             if self.env['account.tax.group']._check_misconfigured_tax_groups(company, countries):
                 self._redirect_to_misconfigured_tax_groups(company, countries)
 
+            # The closing period and options only depend on the company, they are shared by all its fiscal positions
+            closing_options = self._get_vat_closing_entry_options(company, options)
             for move in company_closing_moves:
                 # get tax entries by tax_group for the period defined in options
                 move_options = {**options, 'fiscal_position': move.fiscal_position_id.id if move.fiscal_position_id else 'domestic'}
-                line_ids_vals, tax_group_subtotal = self._compute_vat_closing_entry(company, move_options)
+                closing_vals_by_move[move] = self._compute_vat_closing_entry(company, move_options, closing_options=closing_options)
+
+        # Fetch the balance of every tax group account involved in the closings at once
+        advance_account_ids = {
+            account_id
+            for dummy, tax_group_subtotal in closing_vals_by_move.values()
+            for key in tax_group_subtotal
+            for account_id in key
+            if account_id
+        }
+        advance_balances = self._get_tax_group_closing_balances(advance_account_ids, end_date)
 
-                line_ids_vals += self._add_tax_group_closing_items(tax_group_subtotal, end_date)
+        for move, (line_ids_vals, tax_group_subtotal) in closing_vals_by_move.items():
+            line_ids_vals += self._add_tax_group_closing_items(tax_group_subtotal, end_date, advance_balances=advance_balances)
 
-                if move.line_ids:
-                    line_ids_vals += [Command.delete(aml.id) for aml in move.line_ids]
+            if move.line_ids:
+                line_ids_vals += [Command.delete(aml.id) for aml in move.line_ids]
 
-                move_vals = {}
-                if line_ids_vals:
-                    move_vals['line_ids'] = line_ids_vals
+            move_vals = {}
+            if line_ids_vals:
+                move_vals['line_ids'] = line_ids_vals
 
-                move.write(move_vals)
+            move.write(move_vals)
 
         return closing_moves
 
@@ -171,11 +186,32 @@ class AccountTaxReportHandler(models.AbstractModel):
         return closing_moves
 
     @api.model
-    def _compute_vat_closing_entry(self, company, options):
+    def _get_vat_closing_entry_options(self, company, options):
+        """Get the report options restricted to the tax closing period of the company, before applying the
+        fiscal position of the closing.
+        """
+        new_options = {
+            **options,
+            'all_entries': False,
+            'date': dict(options['date']),
+        }
+
+        period_start, period_end = company._get_tax_closing_period_boundaries(fields.Date.from_string(options['date']['date_to']))
+        new_options['date']['date_from'] = fields.Date.to_string(period_start)
+        new_options['date']['date_to'] = fields.Date.to_string(period_end)
+        new_options['date']['period_type'] = 'custom'
+        new_options['date']['filter'] = 'custom'
+        report = self.env['account.report'].browse(options['report_id'])
+        return report.with_context(allowed_company_ids=company.ids).get_options(previous_options=new_options)
+
+    @api.model
+    def _compute_vat_closing_entry(self, company, options, closing_options=None):
         """Compute the VAT closing entry.
 
         This method returns the one2many commands to balance the tax accounts for the selected period, and
         a dictionnary that will help balance the different accounts set per tax group.
+
+        :param closing_options: The result of _get_vat_closing_entry_options for this company, if already computed.
         """
         self = self.with_company(company) # Needed to handle access to property fields correctly
 
@@ -204,22 +240,11 @@ class AccountTaxReportHandler(models.AbstractModel):
             GROUP BY tax.tax_group_id, "account_move_line".tax_line_id, tax.name, "account_move_line".account_id
         """
 
-        new_options = {
-            **options,
-            'all_entries': False,
-            'date': dict(options['date']),
-        }
-
-        period_start, period_end = company._get_tax_closing_period_boundaries(fields.Date.from_string(options['date']['date_to']))
-        new_options['date']['date_from'] = fields.Date.to_string(period_start)
-        new_options['date']['date_to'] = fields.Date.to_string(period_end)
-        new_options['date']['period_type'] = 'custom'
-        new_options['date']['filter'] = 'custom'
-        report = self.env['account.report'].browse(options['report_id'])
-        new_options = report.with_context(allowed_company_ids=company.ids).get_options(previous_options=new_options)
+        if closing_options is None:
+            closing_options = self._get_vat_closing_entry_options(company, options)
         # Force the use of the fiscal position from the original options (_get_options sets the fiscal
         # position to 'all' when the report is the generic tax report)
-        new_options['fiscal_position'] = options['fiscal_position']
+        new_options = {**closing_options, 'fiscal_position': options['fiscal_position']}
 
         tables, where_clause, where_params = self.env.ref('account.generic_tax_report')._query_get(
             new_options,
@@ -313,15 +338,37 @@ class AccountTaxReportHandler(models.AbstractModel):
         return results
 
     @api.model
-    def _add_tax_group_closing_items(self, tax_group_subtotal, end_date):
+    def _get_tax_group_closing_balances(self, account_ids, end_date):
+        """Get the posted balance of the given tax group accounts up to end_date.
+
+        :return: A dictionary mapping each account id to its balance.
+        """
+        if not account_ids:
+            return {}
+        self.env['account.move.line'].flush_model(['account_id', 'balance', 'date', 'move_id'])
+        self.env['account.move'].flush_model(['state'])
+        self.env.cr.execute('''
+            SELECT aml.account_id, SUM(aml.balance) AS balance
+            FROM account_move_line aml
+            JOIN account_move move ON move.id = aml.move_id
+            WHERE aml.account_id IN %s
+              AND aml.date <= %s
+              AND move.state = 'posted'
+            GROUP BY aml.account_id
+        ''', [tuple(account_ids), end_date])
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def _add_tax_group_closing_items(self, tax_group_subtotal, end_date, advance_balances=None):
         """Transform the parameter tax_group_subtotal dictionnary into one2many commands.
 
         Used to balance the tax group accounts for the creation of the vat closing entry.
+
+        :param advance_balances: The result of _get_tax_group_closing_balances for the accounts of tax_group_subtotal,
+                                 if already computed.
         """
         def _add_line(account, name, company_currency):
-            self.env.cr.execute(sql_account, (account, end_date))
-            result = self.env.cr.dictfetchone()
-            advance_balance = result.get('balance') or 0
+            advance_balance = advance_balances.get(account) or 0
             # Deduct/Add advance payment
             if not company_currency.is_zero(advance_balance):
                 line_ids_vals.append((0, 0, {
@@ -333,14 +380,8 @@ class AccountTaxReportHandler(models.AbstractModel):
             return advance_balance
 
         currency = self.env.company.currency_id
-        sql_account = '''
-            SELECT SUM(aml.balance) AS balance
-            FROM account_move_line aml
-            LEFT JOIN account_move move ON move.id = aml.move_id
-            WHERE aml.account_id = %s
-              AND aml.date <= %s
-              AND move.state = 'posted'
-        '''
+        if advance_balances is None:
+            advance_balances = self._get_tax_group_closing_balances({account_id for key in tax_group_subtotal for account_id in key if account_id}, end_date)
         line_ids_vals = []
         # keep track of already balanced account, as one can be used in several tax group
         account_already_balanced = []
@@ -720,8 +761,7 @@ class GenericTaxReportCustomHandler(models.AbstractModel):
 
         res = {}
         for column_group_key, options in options_by_column_group.items():
-            tables, where_clause, where_params = report._query_get(options, 'strict_range')
-            tax_details_query, tax_details_params = self.env['account.move.line']._get_query_tax_details(tables, where_clause, where_params)
+            tax_details_query, tax_details_params = self._get_tax_details_query(report, options)
 
             # Avoid adding multiple times the same base amount sharing the same grouping_key.
             # It could happen when dealing with group of taxes for example.
@@ -786,6 +826,43 @@ class GenericTaxReportCustomHandler(models.AbstractModel):
 
         return res
 
+    def _get_tax_details_query(self, report, options):
+        """ Get the tax details of the journal items matching the options of a single column group.
+
+        The tax details of posted entries are read from the table maintained on account.move.line, once the outdated
+        ones are recomputed. Options that can involve draft entries or the analytic shadow table fall back on the full
+        tax details computation.
+
+        :return: A tuple (query, params) selecting at least base_line_id, tax_line_id, tax_id, group_tax_id,
+                 tax_repartition_line_id, base_account_id, display_type, base_amount, tax_amount and tax_exigible, as
+                 used by the generic tax report. Unlike _get_query_tax_details, the stored tax details have neither
+                 src_line_id nor the amounts in foreign currency.
+        """
+        tables, where_clause, where_params = report._query_get(options, 'strict_range')
+        if options.get('all_entries') or options.get('analytic_groupby_option'):
+            return self.env['account.move.line']._get_query_tax_details(tables, where_clause, where_params)
+
+        self.env['account.move.line']._refresh_dirty_tax_details()
+
+        # As in _get_query_tax_details, the options are applied on the tax line. The base line is only used for the tax
+        # details without any tax line.
+        self.env['account.move.line'].flush_model()
+        query = f'''
+            WITH matching_amls AS (
+                SELECT account_move_line.id
+                FROM {tables}
+                WHERE {where_clause}
+            )
+            SELECT tax_details.*
+            FROM {TAX_DETAILS_TABLE} tax_details
+            WHERE tax_details.tax_line_id IN (SELECT id FROM matching_amls)
+            OR (
+                tax_details.tax_line_id IS NULL
+                AND tax_details.base_line_id IN (SELECT id FROM matching_amls)
+            )
+        '''
+        return query, where_params
+
     def _populate_lines_recursively(self, report, options, lines, sorting_map_list, groupby_fields, values_node, index=0, type_tax_use=None, parent_line_id=None):
         ''' Populate the list of report lines passed as parameter recursively. At this point, every amounts is already
         fetched for every periods and every groupby.
@@ -1,6 +1,6 @@
 
 
-from odoo import models, _
+from odoo import models, fields, _
 from odoo.tools import format_date, date_utils, get_lang
 from collections import defaultdict
 from odoo.exceptions import UserError, RedirectWarning
@@ -89,6 +89,47 @@ class JournalReportCustomHandler(models.AbstractModel):
                 new_lines.append(line)
         return new_lines
 
+    def _custom_unfold_all_batch_data_generator(self, report, options, lines_to_expand_by_function):
+        """ Fetch the move lines of every journal to unfold in a single scan, instead of one query per journal (and per month
+        when grouping by months). This is what makes printing the journal audit of all journals affordable.
+        """
+        journal_ids = []
+        bank_journal_ids = []
+        for expand_function_name in ('_report_expand_unfoldable_line_journal_report', '_report_expand_unfoldable_line_journal_report_expand_journal_line_by_month'):
+            for line_dict in lines_to_expand_by_function.get(expand_function_name, []):
+                model, model_id = report._get_model_info_from_id(line_dict['id'])
+                if model == 'account.journal':
+                    journal_ids.append(model_id)
+                    if line_dict.get('journal_type') == 'bank':
+                        bank_journal_ids.append(model_id)
+
+        if not journal_ids:
+            return None
+
+        batch_options = options
+        if options['group_by_months']:
+            # Each month is expanded over the whole month (see _report_expand_unfoldable_line_journal_report), even if the
+            # period starts or ends in the middle of it.
+            batch_options = {
+                **options,
+                'date': {
+                    **options['date'],
+                    'date_from': fields.Date.to_string(date_utils.start_of(fields.Date.to_date(options['date']['date_from']), 'month')),
+                    'date_to': fields.Date.to_string(date_utils.end_of(fields.Date.to_date(options['date']['date_to']), 'month')),
+                },
+            }
+
+        return {
+            'aml_values': self._query_aml_batch(batch_options, journal_ids),
+            'months': self._query_months_batch(options, journal_ids) if options['group_by_months'] else {},
+            'initial_balances': self._get_journals_initial_balance_batch(batch_options, bank_journal_ids) if bank_journal_ids else {},
+        }
+
+    def _use_custom_unfold_all_batch_data(self, report, options):
+        # Only printing expands every unfolded journal without any load more limit, the batch avoids one query per journal.
+        # On screen, each journal is expanded by _query_aml to keep the load more pagination.
+        return options['export_mode'] == 'print'
+
     def _query_journal(self, options):
         params = []
         queries = []
@@ -136,8 +177,10 @@ class JournalReportCustomHandler(models.AbstractModel):
     # Get lines methods
     ##########################################################################
 
-    def _get_lines_for_group(self, options, parent_line_id, journal, progress, offset):
-        """ Create the report lines for a group of moves. A group is either a journal, or a month if the report is grouped by month."""
+    def _get_lines_for_group(self, options, parent_line_id, journal, progress, offset, unfold_all_batch_data=None):
+        """ Create the report lines for a group of moves. A group is either a journal, or a month if the report is grouped by month.
+        When unfold_all_batch_data is given, the move lines and initial balances are read from it instead of being queried.
+        """
 
         def cumulate_balance(line, current_balances, is_unreconciled_payment):
             # For bank journals, we want to cumulate the balances and display their evolution line by line until the end.
@@ -154,25 +197,32 @@ class JournalReportCustomHandler(models.AbstractModel):
         treated_results_count = 0
         has_more_lines = False
 
-        eval_dict = self._query_aml(options, offset, journal)
+        # The batch data only holds the first expansion of each journal; load more always queries.
+        use_batch_data = bool(unfold_all_batch_data) and offset == 0
+        if use_batch_data:
+            eval_dict = self._get_batch_aml_values_for_group(options, unfold_all_batch_data, journal)
+        else:
+            eval_dict = self._query_aml(options, offset, journal)
         if offset == 0:
             lines.append(self._get_columns_line(options, parent_line_id, journal.type))
 
         if journal.type == 'bank':
             # Get initial balance, only if the journal is of type 'bank', and we have no offset yet (first unfolding)
             if offset == 0:
-                if journal.type == 'bank':
+                if use_batch_data:
+                    init_balance_by_col_group = self._get_batch_initial_balance_for_group(options, unfold_all_batch_data, journal)
+                else:
                     init_balance_by_col_group = self._get_journal_initial_balance(options, journal.id)
-                    initial_balance_line = self._get_journal_balance_line(
-                        options, parent_line_id, init_balance_by_col_group, is_starting_balance=True)
-                    if initial_balance_line:
-                        lines.append(initial_balance_line)
-                        # For the first expansion of the line, the initial balance line gives the progress
-                        progress = {
-                            column['column_group_key']: line_col.get('no_format', 0.0)
-                            for column, line_col in zip(options['columns'], initial_balance_line['columns'])
-                            if column['expression_label'] == 'additional_col_1'
-                        }
+                initial_balance_line = self._get_journal_balance_line(
+                    options, parent_line_id, init_balance_by_col_group, is_starting_balance=True)
+                if initial_balance_line:
+                    lines.append(initial_balance_line)
+                    # For the first expansion of the line, the initial balance line gives the progress
+                    progress = {
+                        column['column_group_key']: line_col.get('no_format', 0.0)
+                        for column, line_col in zip(options['columns'], initial_balance_line['columns'])
+                        if column['expression_label'] == 'additional_col_1'
+                    }
             # Weither we just fetched them or not, the balance is now in the progress.
             for column_group_key in options['column_groups']:
                 current_balances[column_group_key] = progress.get(column_group_key, 0.0)
@@ -375,7 +425,7 @@ class JournalReportCustomHandler(models.AbstractModel):
         journal = self.env[model].browse(journal_id)
 
         # Get move lines
-        new_lines, after_load_more_lines, has_more, treated_results_count, next_progress, ending_balance_by_col_group = self._get_lines_for_group(new_options, line_dict_id, journal, progress, offset)
+        new_lines, after_load_more_lines, has_more, treated_results_count, next_progress, ending_balance_by_col_group = self._get_lines_for_group(new_options, line_dict_id, journal, progress, offset, unfold_all_batch_data=unfold_all_batch_data)
         lines.extend(new_lines)
         if not has_more and journal.type == 'bank' and ending_balance_by_col_group:
             ending_balance_line = self._get_journal_balance_line(new_options, line_dict_id, ending_balance_by_col_group, is_starting_balance=False)
@@ -398,7 +448,10 @@ class JournalReportCustomHandler(models.AbstractModel):
 
         lines = []
         journal = self.env[model].browse(record_id)
-        aml_results = self._query_months(options, line_dict_id, offset, journal)
+        if unfold_all_batch_data and offset == 0:
+            aml_results = unfold_all_batch_data['months'].get(journal.id, {})
+        else:
+            aml_results = self._query_months(options, line_dict_id, offset, journal)
         lines.extend(self._get_month_lines(options, line_dict_id, aml_results, progress, offset))
 
         return {
@@ -453,6 +506,70 @@ class JournalReportCustomHandler(models.AbstractModel):
 
         return init_balance_by_col_group
 
+    def _get_journals_initial_balance_batch(self, options, journal_ids):
+        """ Computes the initial balance of the given bank journals at the start of the period, and at the start of each
+        month of the period, in one pass: the balance before the period is added to a running sum of the monthly balances.
+
+        :return: {journal_id: {'opening' or month: {column_group_key: balance}}}
+        """
+        queries = []
+        params = []
+        report = self.env.ref('wima_pos.journal_report')
+        for column_group_key, options_group in report._split_options_per_column_group(options).items():
+            init_options = self.env['account.general.ledger.report.handler']._get_options_initial_balance(options_group)  # Same options as the general ledger
+            init_tables, init_where_clause, init_where_params = report._query_get(init_options, 'normal', domain=[('journal_id', 'in', journal_ids)])
+            tables, where_clause, where_params = report._query_get(options_group, 'strict_range', domain=[('journal_id', 'in', journal_ids)])
+            params += init_where_params
+            params += where_params
+            params += [column_group_key, options_group['date']['date_from'], options_group['date']['date_to'], tuple(journal_ids)]
+            queries.append(f"""
+                (WITH opening AS (
+                    SELECT
+                        "account_move_line".journal_id,
+                        SUM("account_move_line".balance) AS balance
+                    FROM {init_tables}
+                    JOIN account_journal journal ON journal.id = "account_move_line".journal_id AND "account_move_line".account_id = journal.default_account_id
+                    WHERE {init_where_clause}
+                    GROUP BY "account_move_line".journal_id
+                ),
+                monthly AS (
+                    SELECT
+                        "account_move_line".journal_id,
+                        date_trunc('month', "account_move_line".date) AS month,
+                        SUM("account_move_line".balance) AS balance
+                    FROM {tables}
+                    JOIN account_journal journal ON journal.id = "account_move_line".journal_id AND "account_move_line".account_id = journal.default_account_id
+                    WHERE {where_clause}
+                    GROUP BY "account_move_line".journal_id, date_trunc('month', "account_move_line".date)
+                )
+                SELECT
+                    %s AS column_group_key,
+                    journal.id AS journal_id,
+                    to_char(period.month, 'MM YYYY') AS month,
+                    COALESCE(opening.balance, 0.0) AS opening_balance,
+                    COALESCE(opening.balance, 0.0) + COALESCE(SUM(monthly.balance) OVER (
+                        PARTITION BY journal.id
+                        ORDER BY period.month
+                        ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                    ), 0.0) AS balance
+                FROM account_journal journal
+                CROSS JOIN generate_series(date_trunc('month', %s::date), %s::date, interval '1 month') AS period(month)
+                LEFT JOIN opening ON opening.journal_id = journal.id
+                LEFT JOIN monthly ON monthly.journal_id = journal.id AND monthly.month = period.month
+                WHERE journal.id IN %s
+                ORDER BY journal.id, period.month)
+            """)
+
+        self._cr.execute(" UNION ALL ".join(queries), params)
+
+        rslt = {}
+        for result in self._cr.dictfetchall():
+            journal_balances = rslt.setdefault(result['journal_id'], {})
+            journal_balances.setdefault('opening', {})[result['column_group_key']] = result['opening_balance']
+            journal_balances.setdefault(result['month'], {})[result['column_group_key']] = result['balance']
+
+        return rslt
+
     def _get_journal_balance_line(self, options, parent_line_id, eval_dict, is_starting_balance=True):
         """ Returns the line holding information about either the starting, or ending balance of a bank journal in the selected period.
 
@@ -692,6 +809,30 @@ class JournalReportCustomHandler(models.AbstractModel):
         }]
         return tax_report_options
 
+    def _get_batch_aml_values_for_group(self, options, unfold_all_batch_data, journal):
+        """ Returns the move lines values of a group (journal or month) from the batch data, in the same format as _query_aml. """
+        aml_values = unfold_all_batch_data['aml_values'].get(journal.id, {})
+        if not options['group_by_months']:
+            return aml_values
+
+        # The batch covers the whole report period; only keep the lines of the month being expanded.
+        date_from = fields.Date.to_date(options['date']['date_from'])
+        date_to = fields.Date.to_date(options['date']['date_to'])
+        return {
+            aml_id: move_line_vals
+            for aml_id, move_line_vals in aml_values.items()
+            if date_from <= next(col_group_val for col_group_val in move_line_vals.values() if col_group_val)['date'] <= date_to
+        }
+
+    def _get_batch_initial_balance_for_group(self, options, unfold_all_batch_data, journal):
+        """ Returns the initial balance of a group (journal or month) from the batch data, in the same format as _get_journal_initial_balance. """
+        balances = unfold_all_batch_data['initial_balances'].get(journal.id, {})
+        if options['group_by_months']:
+            balances = balances.get(fields.Date.to_date(options['date']['date_from']).strftime('%m %Y'), {})
+        else:
+            balances = balances.get('opening', {})
+        return {column_group_key: balances.get(column_group_key, 0.0) for column_group_key in options['column_groups']}
+
     def _group_lines_by_move(self, options, eval_dict, parent_line_id):
         report = self.env['account.report'].browse(options['report_id'])
         grouped_dict = defaultdict(list)
@@ -707,6 +848,37 @@ class JournalReportCustomHandler(models.AbstractModel):
     ####################################################
 
     def _query_aml(self, options, offset=0, journal=False):
+        report = self.env.ref('wima_pos.journal_report')
+        limit_to_load = report.load_more_limit + 1 if report.load_more_limit and options['export_mode'] != 'print' else None
+        query, params = self._get_query_aml(options, [journal.id], offset=offset, limit=limit_to_load)
+
+        # 1.2.Fetch data from DB
+        rslt = {}
+        self._cr.execute(query, params)
+        for aml_result in self._cr.dictfetchall():
+            rslt.setdefault(aml_result['move_line_id'], {col_group_key: {} for col_group_key in options['column_groups']})
+            rslt[aml_result['move_line_id']][aml_result['column_group_key']] = aml_result
+
+        return rslt
+
+    def _query_aml_batch(self, options, journal_ids):
+        """ Fetches the move lines of all the given journals in a single scan ordered by journal.
+
+        :return: {journal_id: {move_line_id: {column_group_key: values}}}, with the same values and order as _query_aml.
+        """
+        query, params = self._get_query_aml(options, journal_ids)
+
+        rslt = {}
+        self._cr.execute(query, params)
+        for aml_result in self._cr.dictfetchall():
+            journal_amls = rslt.setdefault(aml_result['journal_id'], {})
+            journal_amls.setdefault(aml_result['move_line_id'], {col_group_key: {} for col_group_key in options['column_groups']})
+            journal_amls[aml_result['move_line_id']][aml_result['column_group_key']] = aml_result
+
+        return rslt
+
+    def _get_query_aml(self, options, journal_ids, offset=0, limit=None):
+        """ Returns the query and params fetching the move lines of the given journals, ordered by journal first. """
         params = []
         queries = []
         lang = self.env.user.lang or get_lang(self.env).code
@@ -722,14 +894,11 @@ class JournalReportCustomHandler(models.AbstractModel):
         for column_group_key, options_group in report._split_options_per_column_group(options).items():
             # Override any forced options: We want the ones given in the options
             options_group['date'] = options['date']
-            tables, where_clause, where_params = report._query_get(options_group, 'strict_range', domain=[('journal_id', '=', journal.id)])
+            tables, where_clause, where_params = report._query_get(options_group, 'strict_range', domain=[('journal_id', 'in', journal_ids)])
             sort_by_date = options_group.get('sort_by_date')
             params.append(column_group_key)
             params += where_params
-
-            limit_to_load = report.load_more_limit + 1 if report.load_more_limit and options['export_mode'] != 'print' else None
-
-            params += [limit_to_load, offset]
+            params += [limit, offset]
             queries.append(f"""
                 SELECT
                     %s AS column_group_key,
@@ -792,41 +961,47 @@ class JournalReportCustomHandler(models.AbstractModel):
                OFFSET %s
             """)
 
-        # 1.2.Fetch data from DB
-        rslt = {}
-        self._cr.execute('(' + ') UNION ALL ('.join(queries) + ')', params)
-        for aml_result in self._cr.dictfetchall():
-            rslt.setdefault(aml_result['move_line_id'], {col_group_key: {} for col_group_key in options['column_groups']})
-            rslt[aml_result['move_line_id']][aml_result['column_group_key']] = aml_result
-
-        return rslt
+        return '(' + ') UNION ALL ('.join(queries) + ')', params
 
     def _query_months(self, options, line_id=False, offset=0, journal=False):
+        return self._query_months_batch(options, [journal.id]).get(journal.id, {})
+
+    def _query_months_batch(self, options, journal_ids):
+        """ Fetches the months having move lines for all the given journals at once.
+
+        :return: {journal_id: {month: {column_group_key: values}}}, months being ordered chronologically.
+        """
         params = []
         queries = []
         report = self.env.ref('wima_pos.journal_report')
         for column_group_key, options_group in report._split_options_per_column_group(options).items():
-            tables, where_clause, where_params = report._query_get(options_group, 'strict_range', domain=[('journal_id', '=', journal.id)])
+            tables, where_clause, where_params = report._query_get(options_group, 'strict_range', domain=[('journal_id', 'in', journal_ids)])
             params.append(column_group_key)
             params += where_params
             # Fetch all months for which we have any move lines, ordered chronologically.
             queries.append(f"""
                 (WITH aml_by_months AS (
-                    SELECT DISTINCT ON (to_char("account_move_line".date, 'MM YYYY')) to_char("account_move_line".date, 'MM YYYY') AS month, to_char("account_move_line".date, 'fmMon YYYY') AS display_month, %s as column_group_key, "account_move_line".date
+                    SELECT DISTINCT ON ("account_move_line".journal_id, to_char("account_move_line".date, 'MM YYYY'))
+                        "account_move_line".journal_id,
+                        to_char("account_move_line".date, 'MM YYYY') AS month,
+                        to_char("account_move_line".date, 'fmMon YYYY') AS display_month,
+                        %s as column_group_key,
+                        "account_move_line".date
                     FROM {tables}
                     WHERE {where_clause}
                 )
-                SELECT column_group_key, month, display_month
+                SELECT column_group_key, journal_id, month, display_month
                 FROM aml_by_months
-                ORDER BY date)
+                ORDER BY journal_id, date)
             """)
 
         # 1.2.Fetch data from DB
         self._cr.execute(" UNION ALL ".join(queries), params)
         rslt = {}
         for aml_result in self._cr.dictfetchall():
-            rslt.setdefault(aml_result['month'], {col_group_key: {} for col_group_key in options['column_groups']})
-            rslt[aml_result['month']][aml_result['column_group_key']] = aml_result
+            journal_months = rslt.setdefault(aml_result['journal_id'], {})
+            journal_months.setdefault(aml_result['month'], {col_group_key: {} for col_group_key in options['column_groups']})
+            journal_months[aml_result['month']][aml_result['column_group_key']] = aml_result
 
         return rslt
 
@@ -10,6 +10,8 @@ from odoo.exceptions import UserError, ValidationError
 from odoo.osv import expression
 from odoo.tools import frozendict, SQL, date_utils, float_compare
 from odoo.tools.misc import format_date, formatLang
+from odoo.addons.wima_pos.accounting.models.account_bank_statement import AUTO_RECONCILE_SHARD_COUNT
+from odoo.addons.wima_pos.accounting.models.account_move_line import TAX_DETAILS_FIELDS
 
 
 _logger = logging.getLogger(__name__)
@@ -121,6 +123,8 @@ class AccountMove(models.Model):
 
         # Deferred management
         posted = super()._post(soft)
+        self.env['account.move.line']._invalidate_tax_details(posted)
+        self.env['account.move.line']._refresh_reference_tokens(posted)
         for move in self:
             if move._get_deferred_entries_method() == 'on_validation' and any(move.line_ids.mapped('deferred_start_date')):
                 move._generate_deferred_entries()
@@ -139,7 +143,9 @@ class AccountMove(models.Model):
         # EXTENDS 'account' to trigger the CRON auto-reconciling the statement lines.
         res = super().action_post()
         if self.statement_line_id and not self._context.get('skip_statement_line_cron_trigger'):
-            self.env.ref('wima_pos.auto_reconcile_bank_statement_line')._trigger()
+            self.env['account.bank.statement.line']._trigger_auto_reconcile_crons(
+                {journal.id % AUTO_RECONCILE_SHARD_COUNT for journal in self.statement_line_id.journal_id}
+            )
         return res
 
     def button_draft(self):
@@ -154,6 +160,8 @@ class AccountMove(models.Model):
 
         self.deferred_move_ids._unlink_or_reverse()
         super(AccountMove, self).button_draft()
+        self.env['account.move.line']._invalidate_tax_details(self)
+        self.env['account.move.line']._refresh_reference_tokens(self)
         for closing_move in self.filtered(lambda m: m.tax_closing_end_date):
             report, options = closing_move._get_report_options_from_tax_closing_entry()
             closing_months_delay = closing_move.company_id._get_tax_periodicity_months_delay()
@@ -174,9 +182,17 @@ class AccountMove(models.Model):
     def button_cancel(self):
         # OVERRIDE
         res = super(AccountMove, self).button_cancel()
+        self.env['account.move.line']._invalidate_tax_details(self)
+        self.env['account.move.line']._refresh_reference_tokens(self)
         self.env['account.asset'].sudo().search([('original_move_line_ids.move_id', 'in', self.ids)]).write({'active': False})
         return res
 
+    def write(self, vals):
+        res = super().write(vals)
+        if 'ref' in vals or 'name' in vals:
+            self.env['account.move.line']._refresh_reference_tokens(self.filtered(lambda move: move.state == 'posted'))
+        return res
+
     # ============================= START - Deferred Management ====================================
 
     def _get_deferred_entries_method(self):
@@ -235,40 +251,77 @@ class AccountMove(models.Model):
             {'account_id': 1, period_1: 100, period_2: 200},
             {'account_id': 2, period_1: 300, period_2: 400},
         ]
+
+        The whole lines x periods matrix is computed on plain numbers: every date is converted once to its day
+        ordinal and its position in 30-day months (see _get_deferred_diff_dates), so that the amounts are the same
+        as _get_deferred_period_amount without any date arithmetic in the loop.
         """
+        method = self.env.company.deferred_amount_computation_method
+        later_date = fields.Date.to_date(DEFERRED_DATE_MAX)
+        date_positions = {}
+
+        def get_positions(date):
+            # (ordinal, position, position of the day before), position being the ordinal for the 'day' method
+            if date not in date_positions:
+                date_positions[date] = (
+                    date.toordinal(),
+                    self._get_deferred_date_position(method, date),
+                    self._get_deferred_date_position(method, date - relativedelta(days=1)),
+                )
+            return date_positions[date]
+
+        # periods = [Total, Before, ..., Current, ..., Later]
+        periods_positions = []
+        for i, period in enumerate(periods):
+            start_ord, start_pos, start_pos_before = get_positions(period[0])
+            end_ord, end_pos, dummy = get_positions(period[1])
+            periods_positions.append((
+                period,
+                start_ord, start_pos, start_pos_before,
+                end_ord, end_pos,
+                period[1] == later_date,
+                # We are subtracting 1 day to the period start because the start date should be included when:
+                # - we only have one period
+                # - not in the 'Before' or 'Later' period
+                len(periods) <= 1 or i not in (1, len(periods) - 1),
+            ))
+
         values = []
         for line in lines:
             line_start = fields.Date.to_date(line['deferred_start_date'])
             line_end = fields.Date.to_date(line['deferred_end_date'])
-            later_date = fields.Date.to_date(DEFERRED_DATE_MAX)
             if line_end < line_start:
                 # This normally shouldn't happen, but if it does, would cause calculation errors later on.
                 # To not make the reports crash, we just set both dates to the same day.
                 # The user should fix the dates manually.
                 line_end = line_start
+            line_start_ord, line_start_pos, line_start_pos_before = get_positions(line_start)
+            line_end_ord, line_end_pos, dummy = get_positions(line_end)
+
+            # -1 day on the line start because we want to include the start date
+            if method == 'day':
+                amount_per_unit = line['balance'] / (line_end_pos - line_start_pos_before)
+            else:
+                amount_per_unit = line['balance'] / ((line_end_pos - line_start_pos_before) / 30)
 
             columns = {}
-            for i, period in enumerate(periods):
-                # periods = [Total, Before, ..., Current, ..., Later]
-                # The dates to calculate the amount for the current period
-                period_start = max(period[0], line_start)
-                period_end = min(period[1], line_end)
-                if (
-                    period[1] == later_date and period[0] < line_start
-                    or len(periods) <= 1
-                    or i not in (1, len(periods) - 1)
-                ):
-                    # We are subtracting 1 day to `period_start` because the start date should be included when:
-                    # - in the 'Later' period if the deferral has not started yet (line_start, line_end)
-                    # - we only have one period
-                    # - not in the 'Before' or 'Later' period
-                    period_start -= relativedelta(days=1)
-                columns[period] = self._get_deferred_period_amount(
-                    self.env.company.deferred_amount_computation_method,
-                    period_start, period_end,
-                    line_start - relativedelta(days=1), line_end,  # -1 because we want to include the start date
-                    line['balance']
-                )
+            for period, start_ord, start_pos, start_pos_before, end_ord, end_pos, is_later, include_start in periods_positions:
+                # The positions of the dates to calculate the amount for the current period
+                period_end_ord, period_end_pos = min((end_ord, end_pos), (line_end_ord, line_end_pos))
+                # The start date should also be included in the 'Later' period if the deferral has not started yet
+                if include_start or is_later and start_ord < line_start_ord:
+                    period_start_ord, period_start_pos = max((start_ord - 1, start_pos_before), (line_start_ord - 1, line_start_pos_before))
+                else:
+                    period_start_ord, period_start_pos = max((start_ord, start_pos), (line_start_ord, line_start_pos))
+
+                if period_end_ord < line_start_ord:
+                    columns[period] = 0
+                elif method == 'day':
+                    columns[period] = (period_end_pos - period_start_pos) * amount_per_unit
+                elif period_end_ord > period_start_ord:
+                    columns[period] = abs(period_end_pos - period_start_pos) / 30 * amount_per_unit
+                else:
+                    columns[period] = 0
 
             values.append({
                 **self.env['account.move.line']._get_deferred_amounts_by_line_values(line),
@@ -276,6 +329,18 @@ class AccountMove(models.Model):
             })
         return values
 
+    @api.model
+    def _get_deferred_date_position(self, method, date):
+        """
+        Returns the position of a date on the scale used by the deferred amount computation method, so that
+        the difference between two positions is the number of days ('day') or the number of 30-day months
+        times 30 ('month'), as returned by _get_deferred_diff_dates.
+        """
+        if method == 'day':
+            return date.toordinal()
+        day = 30 if date.day == calendar.monthrange(date.year, date.month)[1] else date.day
+        return (date.year * 12 + date.month) * 30 + day
+
     @api.model
     def _get_deferred_lines(self, line, deferred_account, period, ref, force_balance=None):
         """
@@ -876,7 +941,22 @@ class AccountMoveLine(models.Model):
                         "You cannot change the account for a deferred line in %(move_name)s if it has already been deferred.",
                         move_name=line.move_id.display_name
                     ))
-        return super().write(vals)
+        res = super().write(vals)
+        if 'name' in vals:
+            self.env['account.move.line']._refresh_reference_tokens(self.move_id.filtered(lambda move: move.state == 'posted'))
+        if TAX_DETAILS_FIELDS.intersection(vals):
+            self.env['account.move.line']._invalidate_tax_details(self.move_id.filtered(lambda move: move.state == 'posted'))
+        return res
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        self.env['account.move.line']._invalidate_tax_details(lines.move_id.filtered(lambda move: move.state == 'posted'))
+        return lines
+
+    def unlink(self):
+        self.env['account.move.line']._invalidate_tax_details(self.move_id.filtered(lambda move: move.state == 'posted'))
+        return super().unlink()
 
     # ============================= START - Deferred management ====================================
     def _compute_has_deferred_moves(self):
@@ -3,6 +3,27 @@
 from odoo import api, fields, models, _
 
 from odoo.exceptions import UserError
+from odoo.tools.sql import create_index, table_exists
+
+# Deferral period of a line as a date range. LEAST/GREATEST guard against lines whose end date is before their start date.
+DEFERRED_DATE_RANGE_SQL = "daterange(LEAST(deferred_start_date, deferred_end_date), GREATEST(deferred_start_date, deferred_end_date), '[]')"
+
+# Tax details of the posted journal items, as computed by _get_query_tax_details. The moves whose tax details may have changed
+# (posted, reset, edited or using a modified tax) are only recorded in TAX_DETAILS_DIRTY_TABLE, their tax details are
+# recomputed when the table is read by the tax report.
+TAX_DETAILS_TABLE = 'account_move_line_tax_details'
+TAX_DETAILS_DIRTY_TABLE = 'account_move_line_tax_details_dirty'
+
+# Fields of the journal items used by _get_query_tax_details.
+TAX_DETAILS_FIELDS = {
+    'account_id', 'amount_currency', 'analytic_distribution', 'balance', 'credit', 'currency_id', 'debit', 'display_type',
+    'group_tax_id', 'partner_id', 'tax_base_amount', 'tax_ids', 'tax_line_id', 'tax_repartition_line_id', 'tax_tag_ids',
+}
+
+# Tokens of the label, move name and move reference of the open reconcilable journal items, used by the invoice matching
+# rules. Maintained when moves are posted, reset or edited and when their items are fully reconciled or unreconciled.
+REFERENCE_TOKENS_TABLE = 'account_move_line_reference_token'
+
 
 class AccountMoveLine(models.Model):
     _name = "account.move.line"
@@ -18,6 +39,187 @@ class AccountMoveLine(models.Model):
                                         "automatically set when sending reminders through the customer statement.")
     invoice_origin = fields.Char(related='move_id.invoice_origin')
 
+    def init(self):
+        super().init()
+        # Used by the deferred reports to find the lines whose deferral period overlaps the report period
+        create_index(
+            self._cr,
+            'account_move_line_deferred_date_range_idx',
+            self._table,
+            [DEFERRED_DATE_RANGE_SQL],
+            method='gist',
+            where='deferred_start_date IS NOT NULL AND deferred_end_date IS NOT NULL',
+        )
+        if not table_exists(self._cr, TAX_DETAILS_TABLE):
+            self._cr.execute(f'''
+                CREATE TABLE {TAX_DETAILS_TABLE} (
+                    base_line_id integer NOT NULL REFERENCES account_move_line(id) ON DELETE CASCADE,
+                    tax_line_id integer REFERENCES account_move_line(id) ON DELETE CASCADE,
+                    move_id integer NOT NULL,
+                    tax_id integer,
+                    group_tax_id integer,
+                    tax_repartition_line_id integer,
+                    base_account_id integer,
+                    display_type varchar,
+                    base_amount numeric,
+                    tax_amount numeric,
+                    tax_exigible boolean
+                )
+            ''')
+            create_index(self._cr, f'{TAX_DETAILS_TABLE}_base_line_id_idx', TAX_DETAILS_TABLE, ['base_line_id'])
+            create_index(self._cr, f'{TAX_DETAILS_TABLE}_tax_line_id_idx', TAX_DETAILS_TABLE, ['tax_line_id'])
+            create_index(self._cr, f'{TAX_DETAILS_TABLE}_move_id_idx', TAX_DETAILS_TABLE, ['move_id'])
+            self._insert_tax_details([('parent_state', '=', 'posted')])
+        if not table_exists(self._cr, TAX_DETAILS_DIRTY_TABLE):
+            self._cr.execute(f'CREATE TABLE {TAX_DETAILS_DIRTY_TABLE} (move_id integer PRIMARY KEY)')
+        if not table_exists(self._cr, REFERENCE_TOKENS_TABLE):
+            self._cr.execute(f'''
+                CREATE TABLE {REFERENCE_TOKENS_TABLE} (
+                    aml_id integer NOT NULL REFERENCES account_move_line(id) ON DELETE CASCADE,
+                    move_id integer NOT NULL,
+                    source varchar NOT NULL,
+                    exact boolean NOT NULL,
+                    token varchar NOT NULL
+                )
+            ''')
+            create_index(self._cr, f'{REFERENCE_TOKENS_TABLE}_token_idx', REFERENCE_TOKENS_TABLE, ['token'])
+            create_index(self._cr, f'{REFERENCE_TOKENS_TABLE}_aml_id_idx', REFERENCE_TOKENS_TABLE, ['aml_id'])
+            create_index(self._cr, f'{REFERENCE_TOKENS_TABLE}_move_id_idx', REFERENCE_TOKENS_TABLE, ['move_id'])
+            self._insert_reference_tokens([('parent_state', '=', 'posted')])
+
+    @api.model
+    def _insert_tax_details(self, domain):
+        """ Compute the tax details of the journal items matching the domain and store them in the tax details table.
+
+        :param domain: A domain on account.move.line. It must select whole moves, as base and tax lines are matched per move.
+        """
+        self.env.flush_all()
+        query = self._where_calc(domain)
+        tables, where_clause, where_params = query.get_sql()
+        tax_details_query, tax_details_params = self._get_query_tax_details(tables, where_clause, where_params)
+        self._cr.execute(f'''
+            INSERT INTO {TAX_DETAILS_TABLE} (
+                base_line_id, tax_line_id, move_id, tax_id, group_tax_id, tax_repartition_line_id,
+                base_account_id, display_type, base_amount, tax_amount, tax_exigible
+            )
+            SELECT
+                tdr.base_line_id, tdr.tax_line_id, base_line.move_id, tdr.tax_id, tdr.group_tax_id, tdr.tax_repartition_line_id,
+                tdr.base_account_id, tdr.display_type, tdr.base_amount, tdr.tax_amount, tdr.tax_exigible
+            FROM ({tax_details_query}) AS tdr
+            JOIN account_move_line base_line ON base_line.id = tdr.base_line_id
+        ''', tax_details_params)
+
+    @api.model
+    def _refresh_tax_details(self, moves):
+        """ Recompute the stored tax details of the given moves. Only posted moves keep some tax details. """
+        if not moves:
+            return
+        self._cr.execute(f'DELETE FROM {TAX_DETAILS_TABLE} WHERE move_id IN %s', [tuple(moves.ids)])
+        posted_moves = moves.filtered(lambda move: move.state == 'posted')
+        if posted_moves:
+            self._insert_tax_details([('move_id', 'in', posted_moves.ids)])
+
+    @api.model
+    def _invalidate_tax_details(self, moves):
+        """ Mark the stored tax details of the given moves as outdated, see _refresh_dirty_tax_details. """
+        if not moves:
+            return
+        self._cr.execute(
+            f'INSERT INTO {TAX_DETAILS_DIRTY_TABLE} (move_id) SELECT UNNEST(%s) ON CONFLICT DO NOTHING',
+            [list(moves.ids)],
+        )
+
+    @api.model
+    def _invalidate_taxes_tax_details(self, taxes):
+        """ Mark the stored tax details of the posted moves using the given taxes, or a group containing them, as outdated. """
+        if not taxes:
+            return
+        taxes |= self.env['account.tax'].with_context(active_test=False).search([('children_tax_ids', 'in', taxes.ids)])
+        self.flush_model(['move_id', 'parent_state', 'tax_ids', 'tax_line_id', 'group_tax_id'])
+        self._cr.execute(f'''
+            INSERT INTO {TAX_DETAILS_DIRTY_TABLE} (move_id)
+            SELECT DISTINCT aml.move_id
+            FROM account_move_line aml
+            LEFT JOIN account_move_line_account_tax_rel tax_rel ON tax_rel.account_move_line_id = aml.id
+            WHERE aml.parent_state = 'posted'
+            AND (aml.tax_line_id IN %(tax_ids)s OR aml.group_tax_id IN %(tax_ids)s OR tax_rel.account_tax_id IN %(tax_ids)s)
+            ON CONFLICT DO NOTHING
+        ''', {'tax_ids': tuple(taxes.ids)})
+
+    @api.model
+    def _refresh_dirty_tax_details(self):
+        """ Recompute the stored tax details of the moves marked as outdated. """
+        self.env.flush_all()
+        self._cr.execute(f'DELETE FROM {TAX_DETAILS_DIRTY_TABLE} RETURNING move_id')
+        moves = self.env['account.move'].browse([row[0] for row in self._cr.fetchall()]).exists()
+        self._refresh_tax_details(moves)
+
+    @api.model
+    def _insert_reference_tokens(self, domain):
+        """ Tokenize the journal items matching the domain that could be proposed by an invoice matching rule, i.e. the
+        ones on a reconcilable account not fully reconciled yet, and store their tokens in the reference tokens table.
+
+        Each of the label, move name and move reference gives its numerical tokens (the groups of digits it contains)
+        and an exact token (the whole value), as expected by _get_invoice_matching_amls_candidates.
+
+        :param domain: A domain on account.move.line.
+        """
+        self.env.flush_all()
+        query = self._where_calc(domain + [('account_id.reconcile', '=', True), ('full_reconcile_id', '=', False)])
+        tables, where_clause, where_params = query.get_sql()
+        self._cr.execute(rf'''
+            INSERT INTO {REFERENCE_TOKENS_TABLE} (aml_id, move_id, source, exact, token)
+            SELECT
+                account_move_line.id,
+                account_move_line.move_id,
+                source_value.source,
+                token_value.exact,
+                token_value.token
+            FROM {tables}
+            JOIN account_move account_move_line__move_id ON account_move_line__move_id.id = account_move_line.move_id
+            CROSS JOIN LATERAL (
+                SELECT 'name' AS source, account_move_line.name AS value
+                UNION ALL
+                SELECT 'move_name', account_move_line__move_id.name
+                UNION ALL
+                SELECT 'move_ref', account_move_line__move_id.ref
+            ) AS source_value
+            CROSS JOIN LATERAL (
+                SELECT
+                    FALSE AS exact,
+                    UNNEST(
+                        REGEXP_SPLIT_TO_ARRAY(
+                            SUBSTRING(
+                                REGEXP_REPLACE(source_value.value, '[^0-9\s]', '', 'g'),
+                                '\S(?:.*\S)*'
+                            ),
+                            '\s+'
+                        )
+                    ) AS token
+                UNION ALL
+                SELECT TRUE, source_value.value
+                WHERE source_value.value != ''
+            ) AS token_value
+            WHERE {where_clause} AND source_value.value IS NOT NULL
+        ''', where_params)
+
+    @api.model
+    def _refresh_reference_tokens(self, moves):
+        """ Recompute the stored reference tokens of the given moves. Only posted moves keep some tokens. """
+        if not moves:
+            return
+        self._cr.execute(f'DELETE FROM {REFERENCE_TOKENS_TABLE} WHERE move_id IN %s', [tuple(moves.ids)])
+        posted_moves = moves.filtered(lambda move: move.state == 'posted')
+        if posted_moves:
+            self._insert_reference_tokens([('move_id', 'in', posted_moves.ids)])
+
+    @api.model
+    def _refresh_lines_reference_tokens(self, lines):
+        """ Recompute the stored reference tokens of the given journal items, leaving the other items of their moves untouched. """
+        if not lines:
+            return
+        self._cr.execute(f'DELETE FROM {REFERENCE_TOKENS_TABLE} WHERE aml_id IN %s', [tuple(lines.ids)])
+        self._insert_reference_tokens([('id', 'in', lines.ids), ('parent_state', '=', 'posted')])
 
     @api.constrains('tax_ids', 'tax_tag_ids')
     def _check_taxes_on_closing_entries(self):
@@ -29,3 +231,20 @@ class AccountMoveLine(models.Model):
     def _check_auto_transfer_line_ids_tax(self):
         if any(line.move_id.transfer_model_id and line.tax_ids for line in self):
             raise UserError(_("You cannot set Tax on Automatic Transfer's entries."))
+
+
+class AccountFullReconcile(models.Model):
+    _inherit = 'account.full.reconcile'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # Fully reconciled journal items can't be proposed by the invoice matching anymore.
+        fulls = super().create(vals_list)
+        self.env['account.move.line']._refresh_lines_reference_tokens(fulls.reconciled_line_ids)
+        return fulls
+
+    def unlink(self):
+        lines = self.reconciled_line_ids
+        res = super().unlink()
+        self.env['account.move.line']._refresh_lines_reference_tokens(lines)
+        return res
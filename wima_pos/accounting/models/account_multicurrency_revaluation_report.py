@@ -4,6 +4,7 @@ from odoo import models, fields, api, _
 from odoo.tools import float_is_zero
 from odoo.exceptions import UserError
 
+import hashlib
 from itertools import chain
 
 
@@ -201,6 +202,44 @@ class MulticurrencyRevaluationReportCustomHandler(models.AbstractModel):
                 'has_sublines': False,
             }
 
+        cache_key = self._prepare_multi_currency_revaluation_data(report, options)
+        tables, where_clause, where_params = report._query_get(options, 'strict_range')
+        tail_query, tail_params = report._get_engine_query_tail(offset, limit)
+        self._cr.execute(f"""
+            SELECT
+                   account_move_line.{current_groupby} AS grouping_key,
+                   ARRAY_AGG(DISTINCT(revaluation.currency_id)) AS currency_id,
+                   SUM(revaluation.balance_currency) AS balance_currency,
+                   SUM(revaluation.balance_operation) AS balance_operation,
+                   SUM(revaluation.balance_current) AS balance_current,
+                   SUM(revaluation.adjustment) AS adjustment,
+                   COUNT(revaluation.aml_id) AS aml_count
+              FROM {tables}
+              JOIN multicurrency_revaluation_data revaluation ON revaluation.aml_id = account_move_line.id
+             WHERE {where_clause}
+               AND revaluation.cache_key = %s
+               AND revaluation.is_excluded = %s
+          GROUP BY grouping_key
+            {tail_query}
+        """, [*where_params, cache_key, line_code == 'excluded', *tail_params])
+        query_res_lines = self._cr.dictfetchall()
+
+        if not current_groupby:
+            return build_result_dict(report, query_res_lines and query_res_lines[0] or {})
+        else:
+            rslt = []
+            for query_res in query_res_lines:
+                grouping_key = query_res['grouping_key']
+                rslt.append((grouping_key, build_result_dict(report, query_res)))
+            return rslt
+
+    def _prepare_multi_currency_revaluation_data(self, report, options):
+        """ Compute the revaluation of each journal item of the report into the multicurrency_revaluation_data temporary
+        table, for both the included and excluded accounts. The computation is only done once per transaction for the
+        same date, rates and report filters, so that all report lines, expanded lines and the revaluation wizard share it.
+
+        :return: The key identifying the rows computed for these options in the table.
+        """
         query = "(VALUES {})".format(', '.join("(%s, %s)" for rate in options['currency_rates']))
         params = list(chain.from_iterable((cur['currency_id'], cur['rate']) for cur in options['currency_rates'].values()))
         custom_currency_table_query = self.env.cr.mogrify(query, params).decode(self.env.cr.connection.encoding)
@@ -212,8 +251,8 @@ class MulticurrencyRevaluationReportCustomHandler(models.AbstractModel):
         """
 
         date_to = fields.Date.from_string(options['date']['date_to'])
-        tables, where_clause, where_params = report._query_get(options, 'strict_range')
-        tail_query, tail_params = report._get_engine_query_tail(offset, limit)
+        # The line being expanded only restricts the journal items to aggregate, the data is computed for the whole report
+        tables, where_clause, where_params = report._query_get({**options, 'forced_domain': []}, 'strict_range')
         full_query = f"""
             WITH custom_currency_table(currency_id, rate) AS ({custom_currency_table_query}),
                  -- The amount_residuals_by_aml_id will have all moves that have at least one partial at a certain date
@@ -273,46 +312,40 @@ class MulticurrencyRevaluationReportCustomHandler(models.AbstractModel):
             -- (where there is a change in the rates of currency between the creation of the move and the full payments)
             -- - Moves that don't have a payment yet at a certain date
             -- - Moves that have a partial but are not fully paid at a certain date
-            SELECT
-                   subquery.grouping_key,
-                   ARRAY_AGG(DISTINCT(subquery.currency_id)) AS currency_id,
-                   SUM(subquery.balance_currency) AS balance_currency,
-                   SUM(subquery.balance_operation) AS balance_operation,
-                   SUM(subquery.balance_current) AS balance_current,
-                   SUM(subquery.adjustment) AS adjustment,
-                   COUNT(subquery.aml_id) AS aml_count
+            SELECT subquery.*
               FROM (
                 -- From the amount_residuals_by_aml_id we will get all the necessary information for our report 
                 -- for moves that have at least one partial at a certain date, and in this select we add the condition
                 -- that the move is not fully paid.
                 SELECT
-                       """ + (f"account_move_line.{current_groupby} AS grouping_key," if current_groupby else '') + f"""
                        ara.amount_residual AS balance_operation,
                        ara.amount_residual_currency AS balance_currency,
                        ara.amount_residual_currency / custom_currency_table.rate AS balance_current,
                        ara.amount_residual_currency / custom_currency_table.rate - ara.amount_residual AS adjustment,
                        ara.currency_id AS currency_id,
-                       ara.aml_id AS aml_id
+                       ara.aml_id AS aml_id,
+                       EXISTS (
+                            SELECT * FROM account_account_exclude_res_currency_provision WHERE account_account_id = account_id AND res_currency_id = account_move_line.currency_id
+                       ) AS is_excluded
                   FROM {tables}
                   JOIN amount_residuals_by_aml_id ara ON ara.aml_id = account_move_line.id
                   JOIN custom_currency_table ON custom_currency_table.currency_id = ara.currency_id
                  WHERE {where_clause}
                    AND (account_move_line.move_id NOT IN ({select_part_exchange_move_id}))
                    AND (ara.amount_residual != 0 OR ara.amount_residual_currency != 0)
-                   AND {'NOT EXISTS' if line_code == 'to_adjust' else 'EXISTS'} (
-                        SELECT * FROM account_account_exclude_res_currency_provision WHERE account_account_id = account_id AND res_currency_id = account_move_line.currency_id
-                    )
 
                 UNION
                 -- Moves that don't have a payment yet at a certain date
                 SELECT
-                       """ + (f"account_move_line.{current_groupby} AS grouping_key," if current_groupby else '') + f"""
                        account_move_line.balance AS balance_operation,
                        account_move_line.amount_currency AS balance_currency,
                        account_move_line.amount_currency / custom_currency_table.rate AS balance_current,
                        account_move_line.amount_currency / custom_currency_table.rate - account_move_line.balance AS adjustment,
                        account_move_line.currency_id AS currency_id,
-                       account_move_line.id AS aml_id
+                       account_move_line.id AS aml_id,
+                       EXISTS (
+                            SELECT * FROM account_account_exclude_res_currency_provision WHERE account_account_id = account_id AND res_currency_id = account_move_line.currency_id
+                       ) AS is_excluded
                   FROM {tables}
              LEFT JOIN amount_residuals_by_aml_id ara ON ara.aml_id = account_move_line.id
                   JOIN account_account account ON account_move_line.account_id = account.id
@@ -327,16 +360,10 @@ class MulticurrencyRevaluationReportCustomHandler(models.AbstractModel):
                             )
                        )
                    AND (account_move_line.move_id NOT IN ({select_part_exchange_move_id}))
-                   AND {'NOT EXISTS' if line_code == 'to_adjust' else 'EXISTS'} (
-                        SELECT * FROM account_account_exclude_res_currency_provision WHERE account_account_id = account_id AND res_currency_id = account_move_line.currency_id
-                    )
                    AND account.account_type NOT IN ('income', 'income_other', 'expense', 'expense_depreciation', 'expense_direct_cost', 'off_balance')
                    AND ara IS NULL
 
             ) subquery
-
-            GROUP BY grouping_key
-            {tail_query}
         """
         params = [
             date_to,  # For Customer Invoice in amount_residuals_by_aml_id
@@ -345,16 +372,62 @@ class MulticurrencyRevaluationReportCustomHandler(models.AbstractModel):
             date_to,  # Date to for first call of select_part_exchange_move_id
             *where_params,  # Second params for where_clause
             date_to,  # Date to for the second call of select_part_exchange_move_id
-            *tail_params,
         ]
-        self._cr.execute(full_query, params)
-        query_res_lines = self._cr.dictfetchall()
+        full_query = self._cr.mogrify(full_query, params).decode(self._cr.connection.encoding)
+        cache_key = hashlib.md5(full_query.encode()).hexdigest()
+
+        self._cr.execute("""
+            CREATE TEMPORARY TABLE IF NOT EXISTS multicurrency_revaluation_data (
+                cache_key varchar,
+                aml_id integer,
+                currency_id integer,
+                is_excluded boolean,
+                balance_operation numeric,
+                balance_currency numeric,
+                balance_current numeric,
+                adjustment numeric
+            ) ON COMMIT DROP;
+            CREATE TEMPORARY TABLE IF NOT EXISTS multicurrency_revaluation_data_key (
+                cache_key varchar PRIMARY KEY
+            ) ON COMMIT DROP;
+        """)
+        self._cr.execute(
+            "INSERT INTO multicurrency_revaluation_data_key VALUES (%s) ON CONFLICT DO NOTHING RETURNING cache_key",
+            [cache_key],
+        )
+        if self._cr.fetchone():
+            # The query is already mogrified, and the key is an hexadecimal digest
+            self._cr.execute(f"""
+                INSERT INTO multicurrency_revaluation_data (
+                    cache_key, balance_operation, balance_currency, balance_current, adjustment, currency_id, aml_id, is_excluded
+                )
+                SELECT '{cache_key}', data.* FROM ({full_query}) data
+            """)
+            self._cr.execute("CREATE INDEX IF NOT EXISTS multicurrency_revaluation_data_idx ON multicurrency_revaluation_data (cache_key, aml_id)")
+            self._cr.execute("ANALYZE multicurrency_revaluation_data")
+        return cache_key
 
-        if not current_groupby:
-            return build_result_dict(report, query_res_lines and query_res_lines[0] or {})
-        else:
-            rslt = []
-            for query_res in query_res_lines:
-                grouping_key = query_res['grouping_key']
-                rslt.append((grouping_key, build_result_dict(report, query_res)))
-            return rslt
+    def _get_multi_currency_revaluation_adjustments(self, report, options):
+        """ Get the adjustment to book for each currency and account to adjust, as displayed by the report.
+
+        :return: A list of tuples (currency_id, account_id, adjustment), in the order of the report lines.
+        """
+        column_group_options = next(iter(report._split_options_per_column_group(options).values()))
+        cache_key = self._prepare_multi_currency_revaluation_data(report, column_group_options)
+        tables, where_clause, where_params = report._query_get(column_group_options, 'strict_range')
+        self._cr.execute(f"""
+            SELECT
+                   account_move_line.currency_id,
+                   account_move_line.account_id,
+                   SUM(revaluation.adjustment) AS adjustment
+              FROM {tables}
+              JOIN multicurrency_revaluation_data revaluation ON revaluation.aml_id = account_move_line.id
+              JOIN res_currency revaluation_currency ON revaluation_currency.id = account_move_line.currency_id
+              JOIN account_account revaluation_account ON revaluation_account.id = account_move_line.account_id
+             WHERE {where_clause}
+               AND revaluation.cache_key = %s
+               AND NOT revaluation.is_excluded
+          GROUP BY account_move_line.currency_id, account_move_line.account_id, revaluation_currency.name, revaluation_account.code
+          ORDER BY revaluation_currency.name, revaluation_account.code
+        """, [*where_params, cache_key])
+        return self._cr.fetchall()
@@ -1,13 +1,30 @@
-from odoo import fields, models, Command, tools
+from odoo import api, fields, models, Command, tools
+from odoo.addons.wima_pos.accounting.models.account_move_line import REFERENCE_TOKENS_TABLE
 
 import re
+import time
 from collections import defaultdict
 from dateutil.relativedelta import relativedelta
 
+# Bounds of the search of a combination of candidates matching a statement line, see
+# _get_invoice_matching_amls_subset_candidates.
+SUBSET_MATCHING_MAX_CANDIDATES = 50
+SUBSET_MATCHING_MAX_SUMS = 200000
+SUBSET_MATCHING_TIME_BUDGET = 0.5  # seconds
+
+# Fields of the reconciliation models deciding which ones are cached by _get_journal_reconcile_model_ids, and in which order.
+JOURNAL_RECONCILE_MODEL_FIELDS = {'active', 'company_id', 'match_journal_ids', 'rule_type', 'sequence'}
+
 
 class AccountReconcileModel(models.Model):
     _inherit = 'account.reconcile.model'
 
+    subset_matching = fields.Boolean(
+        string="Match Invoice Combinations",
+        help="When no invoice is found from the label of the transaction, look for a combination of open invoices of "
+             "the partner whose amounts sum up to the transaction amount, within the payment tolerance.",
+    )
+
     ####################################################
     # RECONCILIATION PROCESS
     ####################################################
@@ -198,35 +215,140 @@ class AccountReconcileModel(models.Model):
                 }
         return {}
 
+    @api.model
+    def _apply_rules_batch(self, st_lines):
+        ''' Apply the reconciliation models to several statement lines at once. Each statement line gets the result
+        _apply_rules would give for it, using the models of its company and journal and the partner retrieved from it,
+        but the reconciliation models are searched once for all of them instead of once per statement line, and their
+        partners are retrieved together.
+
+        :param st_lines:    The statement lines to match.
+        :return:            A dict mapping each statement line id with the result of _apply_rules for it.
+        '''
+        reconcile_models = self.search([
+            ('rule_type', '!=', 'writeoff_button'),
+            ('company_id', 'in', st_lines.company_id.ids),
+        ])
+
+        partners = st_lines.filtered(lambda st_line: not st_line.is_reconciled)._retrieve_partners()
+        results = {}
+        models_per_journal = {}
+        for st_line in st_lines:
+            if st_line.is_reconciled:
+                results[st_line.id] = {}
+                continue
+
+            journal = st_line.journal_id
+            if journal not in models_per_journal:
+                models_per_journal[journal] = reconcile_models.filtered(lambda m: (
+                    m.company_id == st_line.company_id
+                    and (not m.match_journal_ids or journal in m.match_journal_ids)
+                ))
+            results[st_line.id] = models_per_journal[journal]._apply_rules(st_line, partners[st_line.id])
+        return results
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        reconcile_models = super().create(vals_list)
+        # Invalidate the models cached by _get_journal_reconcile_model_ids
+        self.env.registry.clear_cache()
+        return reconcile_models
+
+    def write(self, vals):
+        res = super().write(vals)
+        # Invalidate the filters cached by _get_applicability_filters and the models cached by
+        # _get_journal_reconcile_model_ids, only when the written fields are part of them.
+        if any(fname.startswith('match_') or fname in JOURNAL_RECONCILE_MODEL_FIELDS for fname in vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+    @api.model
+    @tools.ormcache('self.env.uid', 'self.env.su', 'tuple(self.env.companies.ids)', 'company_id', 'journal_id', 'writeoff_button')
+    def _get_journal_reconcile_model_ids(self, company_id, journal_id, writeoff_button):
+        """ Get the reconciliation models available in the bank reconciliation widget for the statement lines of a
+        journal. The result is cached per user and allowed companies, as the search is subject to the record rules, and
+        invalidated when a reconciliation model is created, deleted or written on the fields it depends on.
+
+        :param company_id:      The company of the statement lines.
+        :param journal_id:      The journal of the statement lines.
+        :param writeoff_button: True to get the models displayed as buttons, False to get the ones applied as rules.
+        :return:                A tuple of reconciliation model ids, in their order.
+        """
+        return tuple(self.search([
+            ('rule_type', '=' if writeoff_button else '!=', 'writeoff_button'),
+            ('company_id', '=', company_id),
+            '|',
+            ('match_journal_ids', '=', False),
+            ('match_journal_ids', '=', journal_id),
+        ]).ids)
+
+    @tools.ormcache('self.id')
+    def _get_applicability_filters(self):
+        """ Get the conditions of this reconciliation model checked by _is_applicable_for.
+
+        The result is cached per reconciliation model and invalidated when one of its 'match_' fields is written.
+
+        :return: A dict with the journal, partner and partner category ids, the amount bounds, and a tuple of
+                 (statement line field, condition, lowercased term, compiled regex) for the text conditions.
+        """
+        self.ensure_one()
+        text_filters = []
+        for rule_field, record_field in [('label', 'payment_ref'), ('note', 'narration'), ('transaction_type', 'transaction_type')]:
+            condition = self['match_' + rule_field]
+            if not condition:
+                continue
+            rule_term = (self['match_' + rule_field + '_param'] or '').lower()
+            regex = re.compile(rule_term) if condition == 'match_regex' else None
+            text_filters.append((record_field, condition, rule_term, regex))
+
+        return {
+            'journal_ids': frozenset(self.match_journal_ids.ids),
+            'nature': self.match_nature,
+            'amount': self.match_amount,
+            'amount_min': self.match_amount_min,
+            'amount_max': self.match_amount_max,
+            'partner': self.match_partner,
+            'partner_ids': frozenset(self.match_partner_ids.ids),
+            'partner_category_ids': frozenset(self.match_partner_category_ids.ids),
+            'text_filters': tuple(text_filters),
+        }
+
     def _is_applicable_for(self, st_line, partner):
         """ Returns true iff this reconciliation model can be used to search for matches
         for the provided statement line and partner.
         """
         self.ensure_one()
+        filters = self._get_applicability_filters()
 
         # Filter on journals, amount nature, amount and partners
         # All the conditions defined in this block are non-match conditions.
-        if ((self.match_journal_ids and st_line.move_id.journal_id not in self.match_journal_ids)
-            or (self.match_nature == 'amount_received' and st_line.amount < 0)
-            or (self.match_nature == 'amount_paid' and st_line.amount > 0)
-            or (self.match_amount == 'lower' and abs(st_line.amount) >= self.match_amount_max)
-            or (self.match_amount == 'greater' and abs(st_line.amount) <= self.match_amount_min)
-            or (self.match_amount == 'between' and (abs(st_line.amount) > self.match_amount_max or abs(st_line.amount) < self.match_amount_min))
-            or (self.match_partner and not partner)
-            or (self.match_partner and self.match_partner_ids and partner not in self.match_partner_ids)
-            or (self.match_partner and self.match_partner_category_ids and not (partner.category_id & self.match_partner_category_ids))
+        amount = abs(st_line.amount)
+        if ((filters['journal_ids'] and st_line.move_id.journal_id.id not in filters['journal_ids'])
+            or (filters['nature'] == 'amount_received' and st_line.amount < 0)
+            or (filters['nature'] == 'amount_paid' and st_line.amount > 0)
+            or (filters['amount'] == 'lower' and amount >= filters['amount_max'])
+            or (filters['amount'] == 'greater' and amount <= filters['amount_min'])
+            or (filters['amount'] == 'between' and (amount > filters['amount_max'] or amount < filters['amount_min']))
+            or (filters['partner'] and not partner)
+            or (filters['partner'] and filters['partner_ids'] and partner.id not in filters['partner_ids'])
+            or (filters['partner'] and filters['partner_category_ids'] and filters['partner_category_ids'].isdisjoint(partner.category_id.ids))
         ):
             return False
 
         # Filter on label, note and transaction_type
-        for record, rule_field, record_field in [(st_line, 'label', 'payment_ref'), (st_line.move_id, 'note', 'narration'), (st_line, 'transaction_type', 'transaction_type')]:
-            rule_term = (self['match_' + rule_field + '_param'] or '').lower()
+        for record_field, condition, rule_term, regex in filters['text_filters']:
+            record = st_line.move_id if record_field == 'narration' else st_line
             record_term = (record[record_field] or '').lower()
 
             # This defines non-match conditions
-            if ((self['match_' + rule_field] == 'contains' and rule_term not in record_term)
-                or (self['match_' + rule_field] == 'not_contains' and rule_term in record_term)
-                or (self['match_' + rule_field] == 'match_regex' and not re.match(rule_term, record_term))
+            if ((condition == 'contains' and rule_term not in record_term)
+                or (condition == 'not_contains' and rule_term in record_term)
+                or (condition == 'match_regex' and not regex.match(record_term))
             ):
                 return False
 
@@ -320,74 +442,33 @@ class AccountReconcileModel(models.Model):
         self.env['account.move.line'].flush_model()
 
         if self.matching_order == 'new_first':
-            order_by = 'sub.date_maturity DESC, sub.date DESC, sub.id DESC'
+            order_by = 'account_move_line.date_maturity DESC, account_move_line.date DESC, account_move_line.id DESC'
         else:
-            order_by = 'sub.date_maturity ASC, sub.date ASC, sub.id ASC'
+            order_by = 'account_move_line.date_maturity ASC, account_move_line.date ASC, account_move_line.id ASC'
 
         aml_domain = self._get_invoice_matching_amls_domain(st_line, partner)
         query = self.env['account.move.line']._where_calc(aml_domain)
         tables, where_clause, where_params = query.get_sql()
 
-        sub_queries = []
-        all_params = []
+        # The label, move name and move reference of the candidates are tokenized once in the reference tokens table,
+        # a numerical token being only compared to the numerical tokens of the candidates when the statement line has some.
         numerical_tokens, exact_tokens, _text_tokens = self._get_invoice_matching_st_line_tokens(st_line)
-        if numerical_tokens:
-            for table_alias, field in (
-                ('account_move_line', 'name'),
-                ('account_move_line__move_id', 'name'),
-                ('account_move_line__move_id', 'ref'),
-            ):
-                sub_queries.append(rf'''
-                    SELECT
-                        account_move_line.id,
-                        account_move_line.date,
-                        account_move_line.date_maturity,
-                        UNNEST(
-                            REGEXP_SPLIT_TO_ARRAY(
-                                SUBSTRING(
-                                    REGEXP_REPLACE({table_alias}.{field}, '[^0-9\s]', '', 'g'),
-                                    '\S(?:.*\S)*'
-                                ),
-                                '\s+'
-                            )
-                        ) AS token
-                    FROM {tables}
-                    JOIN account_move account_move_line__move_id ON account_move_line__move_id.id = account_move_line.move_id
-                    WHERE {where_clause} AND {table_alias}.{field} IS NOT NULL
-                ''')
-                all_params += where_params
-
-        if exact_tokens:
-            for table_alias, field in (
-                ('account_move_line', 'name'),
-                ('account_move_line__move_id', 'name'),
-                ('account_move_line__move_id', 'ref'),
-            ):
-                sub_queries.append(rf'''
-                    SELECT
-                        account_move_line.id,
-                        account_move_line.date,
-                        account_move_line.date_maturity,
-                        {table_alias}.{field} AS token
-                    FROM {tables}
-                    JOIN account_move account_move_line__move_id ON account_move_line__move_id.id = account_move_line.move_id
-                    WHERE {where_clause} AND COALESCE({table_alias}.{field}, '') != ''
-                ''')
-                all_params += where_params
-
-        if sub_queries:
+        token_kinds = ([False] if numerical_tokens else []) + ([True] if exact_tokens else [])
+        if token_kinds:
             self._cr.execute(
-                '''
+                f'''
                     SELECT
-                        sub.id,
+                        account_move_line.id,
                         COUNT(*) AS nb_match
-                    FROM (''' + ' UNION ALL '.join(sub_queries) + ''') AS sub
-                    WHERE sub.token IN %s
-                    GROUP BY sub.date_maturity, sub.date, sub.id
-                    HAVING COUNT(*) > 0
-                    ORDER BY nb_match DESC, ''' + order_by + '''
+                    FROM {tables}
+                    JOIN {REFERENCE_TOKENS_TABLE} reference_token ON reference_token.aml_id = account_move_line.id
+                    WHERE {where_clause}
+                    AND reference_token.token IN %s
+                    AND reference_token.exact IN %s
+                    GROUP BY account_move_line.date_maturity, account_move_line.date, account_move_line.id
+                    ORDER BY nb_match DESC, {order_by}
                 ''',
-                all_params + [tuple(numerical_tokens + exact_tokens)],
+                where_params + [tuple(numerical_tokens + exact_tokens), tuple(token_kinds)],
             )
             candidate_ids = [r[0] for r in self._cr.fetchall()]
             if candidate_ids:
@@ -397,6 +478,18 @@ class AccountReconcileModel(models.Model):
                 }
 
         # Search without any matching based on textual information.
+        # With the subset matching, it's done by a later rule, after looking for a combination matching the amount.
+        if not self.subset_matching:
+            return self._get_invoice_matching_amls_partner_candidates(st_line, partner)
+
+    def _get_invoice_matching_amls_partner_candidates(self, st_line, partner):
+        """ Returns all the open journal items of the partner as match candidates for the 'invoice_matching' rule,
+        without any matching based on textual information.
+
+        :param st_line: A statement line.
+        :param partner: The partner associated to the statement line.
+        """
+        assert self.rule_type == 'invoice_matching'
         if partner:
 
             if self.matching_order == 'new_first':
@@ -404,6 +497,7 @@ class AccountReconcileModel(models.Model):
             else:
                 order = 'date_maturity ASC, date ASC, id ASC'
 
+            aml_domain = self._get_invoice_matching_amls_domain(st_line, partner)
             amls = self.env['account.move.line'].search(aml_domain, order=order)
             if amls:
                 return {
@@ -411,6 +505,77 @@ class AccountReconcileModel(models.Model):
                     'amls': amls,
                 }
 
+    def _get_invoice_matching_amls_subset_candidates(self, st_line, partner):
+        """ Returns the match candidates for the 'invoice_matching' rule when the subset matching is enabled: the
+        combination of open journal items of the partner whose residual amounts sum up to the amount of the statement
+        line, or exceed it within the payment tolerance.
+
+        The reachable sums are computed in the smallest unit of the currency, one candidate after the other, and the
+        search is given up when it exceeds SUBSET_MATCHING_TIME_BUDGET or SUBSET_MATCHING_MAX_SUMS. The candidates are
+        only allowed to be auto-reconciled if no other combination reaches the same amount.
+
+        :param st_line: A statement line.
+        :param partner: The partner associated to the statement line.
+        """
+        assert self.rule_type == 'invoice_matching'
+        if not partner:
+            return
+
+        if self.matching_order == 'new_first':
+            order = 'date_maturity DESC, date DESC, id DESC'
+        else:
+            order = 'date_maturity ASC, date ASC, id ASC'
+
+        currency = st_line.foreign_currency_id or st_line.currency_id
+        aml_domain = self._get_invoice_matching_amls_domain(st_line, partner) + [('currency_id', '=', currency.id)]
+        amls = self.env['account.move.line'].search(aml_domain, order=order, limit=SUBSET_MATCHING_MAX_CANDIDATES)
+        if not amls:
+            return
+
+        # Express the amounts as positive integers in the smallest unit of the currency.
+        st_line_amount = -st_line._prepare_move_line_default_vals()[1]['amount_currency']
+        sign = 1 if st_line_amount > 0.0 else -1
+        target = round(sign * st_line_amount / currency.rounding)
+        amounts = [round(sign * aml.amount_residual_currency / currency.rounding) for aml in amls]
+
+        # Highest total of the candidates accepted by _check_rule_propositions.
+        max_total = target
+        if self.allow_payment_tolerance and self.payment_tolerance_param:
+            if self.payment_tolerance_type == 'fixed_amount':
+                max_total += round(self.payment_tolerance_param / currency.rounding)
+            elif self.payment_tolerance_param < 100.0:
+                max_total = int(target / (1 - self.payment_tolerance_param / 100.0))
+            else:
+                max_total = sum(amount for amount in amounts if amount > 0)
+
+        # Map each reachable total with the bitmask of the first combination of candidates reaching it and the number
+        # of combinations reaching it, counted up to 2.
+        reachable = {0: (0, 1)}
+        deadline = time.monotonic() + SUBSET_MATCHING_TIME_BUDGET
+        for index, amount in enumerate(amounts):
+            if amount <= 0:
+                continue
+            if time.monotonic() > deadline or len(reachable) > SUBSET_MATCHING_MAX_SUMS:
+                return
+            for total, (mask, count) in list(reachable.items()):
+                new_total = total + amount
+                if new_total > max_total:
+                    continue
+                if new_total in reachable:
+                    new_mask, new_count = reachable[new_total]
+                    reachable[new_total] = (new_mask, min(new_count + count, 2))
+                else:
+                    reachable[new_total] = (mask | (1 << index), count)
+
+        totals = [total for total in reachable if total and target <= total <= max_total]
+        if not totals:
+            return
+        mask, count = reachable[min(totals)]
+        return {
+            'allow_auto_reconcile': count == 1,
+            'amls': amls.browse([aml.id for index, aml in enumerate(amls) if mask & (1 << index)]),
+        }
+
     def _get_invoice_matching_rules_map(self):
         """ Get a mapping <priority_order, rule> that could be overridden in others modules.
 
@@ -421,6 +586,9 @@ class AccountReconcileModel(models.Model):
         """
         rules_map = defaultdict(list)
         rules_map[10].append(self._get_invoice_matching_amls_candidates)
+        if self.subset_matching:
+            rules_map[20].append(self._get_invoice_matching_amls_subset_candidates)
+            rules_map[30].append(self._get_invoice_matching_amls_partner_candidates)
         return rules_map
 
     def _get_partner_from_mapping(self, st_line):
@@ -622,4 +790,4 @@ class AccountReconcileModel(models.Model):
         """
         cron_limit_time = tools.config['limit_time_real_cron']  # default is -1
         limit_time = cron_limit_time if 0 < cron_limit_time < 180 else 180
-        self.env['account.bank.statement.line']._cron_try_auto_reconcile_statement_lines(limit_time=limit_time)
+        self.env['account.bank.statement.line']._cron_try_auto_reconcile_statement_lines(batch_size=100, limit_time=limit_time)
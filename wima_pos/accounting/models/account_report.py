@@ -19,7 +19,7 @@ from dateutil.relativedelta import relativedelta
 from odoo.addons.web.controllers.utils import clean_action
 from odoo import models, fields, api, _, osv, _lt
 from odoo.exceptions import RedirectWarning, UserError, ValidationError
-from odoo.tools import config, date_utils, get_lang, float_compare, float_is_zero
+from odoo.tools import config, date_utils, get_lang, float_compare, float_is_zero, SQL
 from odoo.tools.float_utils import float_round
 from odoo.tools.misc import formatLang, format_date, xlsxwriter
 from odoo.tools.safe_eval import expr_eval, safe_eval
@@ -1716,6 +1716,9 @@ class AccountReport(models.Model):
         self.env['account.move.line'].check_access_rights('read')
 
         query = self.env['account.move.line']._where_calc(domain)
+        if self.env.context.get('account_report_aml_table'):
+            # Read the journal items from a table with the same columns, e.g. a snapshot of aggregated balances.
+            query._tables['account_move_line'] = SQL.identifier(self.env.context['account_report_aml_table'])
 
         # Wrap the query with 'company_id IN (...)' to avoid bypassing company access rights.
         self.env['account.move.line']._apply_ir_rules(query)
@@ -2156,7 +2159,7 @@ class AccountReport(models.Model):
         custom_unfold_all_batch_data = None
 
         # If it's possible to batch unfold and we're unfolding all lines, compute the batch, so that individual expansions are more efficient
-        if options['unfold_all'] and self.custom_handler_model_id:
+        if self.custom_handler_model_id and self.env[self.custom_handler_model_name]._use_custom_unfold_all_batch_data(self, options):
             lines_to_expand_by_function = {}
             for line_dict in lines:
                 if line_need_expansion(line_dict):
@@ -5673,6 +5676,12 @@ class AccountReportCustomHandler(models.AbstractModel):
         """
         return None
 
+    def _use_custom_unfold_all_batch_data(self, report, options):
+        """ Whether _custom_unfold_all_batch_data_generator must be called before expanding the lines. By default, only
+        when using the 'unfold all' option.
+        """
+        return options['unfold_all']
+
     def _get_custom_display_config(self):
         """ To be overridden in order to change the templates used by Javascript to render this report (keeping the same
         OWL components), and/or replace some of the default OWL components by custom-made ones.
@@ -189,56 +189,64 @@ class ECSalesReportCustomHandler(models.AbstractModel):
         :return:                    (accounts_values, taxes_results)
         '''
         groupby_partners = {}
-
-        def assign_sum(row):
-            """
-            Assign corresponding values from the SQL querry row to the groupby_partners dictionary.
-            If the line balance isn't 0, find the tax tag_id and check in which column/report line the SQL line balance
-            should be displayed.
-
-            The tricky part is to allow for the report to be displayed in vertical or horizontal format.
-            In vertical, you have up to 3 lines per partner (one for each operation type).
-            In horizontal, you have one line with 3 columns per partner (one for each operation type).
-
-            Add then the more straightforward data (vat number, country code, ...)
-            :param dict row:
-            """
-            if not company_currency.is_zero(row['balance']):
-                groupby_partners.setdefault(row['groupby'], defaultdict(lambda: defaultdict(float)))
-
-                groupby_partners_keyed = groupby_partners[row['groupby']][row['column_group_key']]
-                if row['tax_element_id'] in options['sales_report_taxes']['goods']:
-                    groupby_partners_keyed['goods'] += row['balance']
-                elif row['tax_element_id'] in options['sales_report_taxes']['triangular']:
-                    groupby_partners_keyed['triangular'] += row['balance']
-                elif row['tax_element_id'] in options['sales_report_taxes']['services']:
-                    groupby_partners_keyed['services'] += row['balance']
-
-                groupby_partners_keyed.setdefault('tax_element_id', []).append(row['tax_element_id'])
-                groupby_partners_keyed.setdefault('sales_type_code', []).append(row['sales_type_code'])
-
-                vat = row['vat_number'] or ''
-                groupby_partners_keyed.setdefault('vat_number', vat[2:])
-                groupby_partners_keyed.setdefault('full_vat_number', vat)
-                groupby_partners_keyed.setdefault('country_code', vat[:2])
-
-                if warnings is not None:
-                    if row['country_code'] not in self._get_ec_country_codes(options):
-                        warnings['wima_pos.sales_report_warning_non_ec_country'] = {'alert_type': 'warning'}
-                    elif not row.get('vat_number'):
-                        warnings['wima_pos.sales_report_warning_missing_vat'] = {'alert_type': 'warning'}
-                    if row.get('same_country') and row['country_code']:
-                        warnings['wima_pos.sales_report_warning_same_country'] = {'alert_type': 'warning'}
-
         company_currency = self.env.company.currency_id
+        goods, triangular, services = (list(options['sales_report_taxes'][operation_type]) for operation_type in ('goods', 'triangular', 'services'))
 
-        # Execute the queries and dispatch the results.
+        # Aggregate the sums per partner and column group directly in SQL.
+        # A row whose balance is zero in the company currency is ignored, and each tax element is only counted in the
+        # first operation type it belongs to (goods, then triangular, then services).
         query, params = self._get_query_sums(report, options)
-        self._cr.execute(query, params)
+        self._cr.execute(f"""
+            SELECT
+                sums.groupby,
+                sums.column_group_key,
+                SUM(sums.balance) FILTER (WHERE sums.tax_element_id = ANY(%s)) AS goods,
+                SUM(sums.balance) FILTER (
+                    WHERE sums.tax_element_id = ANY(%s)
+                      AND sums.tax_element_id != ALL(%s)
+                ) AS triangular,
+                SUM(sums.balance) FILTER (
+                    WHERE sums.tax_element_id = ANY(%s)
+                      AND sums.tax_element_id != ALL(%s)
+                      AND sums.tax_element_id != ALL(%s)
+                ) AS services,
+                ARRAY_AGG(sums.tax_element_id ORDER BY sums.tax_element_id) AS tax_element_id,
+                ARRAY_AGG(sums.sales_type_code ORDER BY sums.tax_element_id) AS sales_type_code,
+                MIN(sums.vat_number) AS vat_number,
+                ARRAY_AGG(DISTINCT sums.country_code) AS country_codes,
+                BOOL_OR(sums.same_country AND sums.country_code IS NOT NULL) AS same_country
+            FROM ({query}) sums
+            WHERE ROUND(sums.balance, %s) != 0
+            GROUP BY sums.groupby, sums.column_group_key
+        """, [
+            goods, triangular, goods, services, goods, triangular,
+            *params,
+            company_currency.decimal_places,
+        ])
 
-        dictfetchall = self._cr.dictfetchall()
-        for res in dictfetchall:
-            assign_sum(res)
+        ec_country_codes = self._get_ec_country_codes(options)
+        for row in self._cr.dictfetchall():
+            groupby_partners.setdefault(row['groupby'], defaultdict(lambda: defaultdict(float)))
+            groupby_partners_keyed = groupby_partners[row['groupby']][row['column_group_key']]
+            for operation_type in ('goods', 'triangular', 'services'):
+                if row[operation_type] is not None:
+                    groupby_partners_keyed[operation_type] += row[operation_type]
+
+            groupby_partners_keyed['tax_element_id'] = row['tax_element_id']
+            groupby_partners_keyed['sales_type_code'] = row['sales_type_code']
+
+            vat = row['vat_number'] or ''
+            groupby_partners_keyed['vat_number'] = vat[2:]
+            groupby_partners_keyed['full_vat_number'] = vat
+            groupby_partners_keyed['country_code'] = vat[:2]
+
+            if warnings is not None:
+                if any(country_code not in ec_country_codes for country_code in row['country_codes']):
+                    warnings['wima_pos.sales_report_warning_non_ec_country'] = {'alert_type': 'warning'}
+                elif not row['vat_number']:
+                    warnings['wima_pos.sales_report_warning_missing_vat'] = {'alert_type': 'warning'}
+                if row['same_country']:
+                    warnings['wima_pos.sales_report_warning_same_country'] = {'alert_type': 'warning'}
 
         if groupby_partners:
             partners = self.env['res.partner'].with_context(active_test=False).browse(groupby_partners.keys())
@@ -3,6 +3,12 @@
 from odoo import api, models, fields, Command, _
 from odoo.exceptions import ValidationError
 
+# Fields of the taxes used by _get_query_tax_details.
+TAX_DETAILS_TAX_FIELDS = {
+    'amount', 'amount_type', 'children_tax_ids', 'include_base_amount', 'invoice_repartition_line_ids',
+    'is_base_affected', 'price_include', 'refund_repartition_line_ids', 'tax_exigibility',
+}
+
 
 class AccountTaxUnit(models.Model):
     _name = "account.tax.unit"
@@ -119,3 +125,36 @@ class AccountTaxUnit(models.Model):
             self.main_company_id = self.company_ids[0]._origin
         elif not self.company_ids:
             self.main_company_id = False
+
+
+class AccountTax(models.Model):
+    _inherit = "account.tax"
+
+    def write(self, vals):
+        # EXTENDS account
+        res = super().write(vals)
+        if TAX_DETAILS_TAX_FIELDS.intersection(vals):
+            self.env['account.move.line']._invalidate_taxes_tax_details(self)
+        return res
+
+
+class AccountTaxRepartitionLine(models.Model):
+    _inherit = "account.tax.repartition.line"
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # EXTENDS account
+        repartition_lines = super().create(vals_list)
+        self.env['account.move.line']._invalidate_taxes_tax_details(repartition_lines.tax_id)
+        return repartition_lines
+
+    def write(self, vals):
+        # EXTENDS account
+        res = super().write(vals)
+        self.env['account.move.line']._invalidate_taxes_tax_details(self.tax_id)
+        return res
+
+    def unlink(self):
+        # EXTENDS account
+        self.env['account.move.line']._invalidate_taxes_tax_details(self.tax_id)
+        return super().unlink()
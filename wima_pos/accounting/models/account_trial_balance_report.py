@@ -1,6 +1,7 @@
 
 
-from odoo import models, _, fields
+from odoo import api, models, _, fields
+from odoo.osv import expression
 from odoo.tools import float_compare
 from odoo.tools.misc import DEFAULT_SERVER_DATE_FORMAT
 
@@ -33,6 +34,10 @@ class TrialBalanceCustomHandler(models.AbstractModel):
                 _update_column(line, debit_column_key, new_debit_value)
                 _update_column(line, credit_column_key, new_credit_value)
 
+        if self._can_use_balance_snapshot(report, options):
+            self._prepare_balance_snapshot(report, options)
+            report = report.with_context(account_report_aml_table='trial_balance_temp_account_move_line')
+
         lines = [line[1] for line in self.env['account.general.ledger.report.handler']._dynamic_lines_generator(report, options, all_column_groups_expression_totals, warnings=warnings)]
 
         total_diff_values = {
@@ -83,6 +88,76 @@ class TrialBalanceCustomHandler(models.AbstractModel):
 
         return [(0, line) for line in lines]
 
+    def _can_use_balance_snapshot(self, report, options):
+        """ Tell whether the general ledger sums of this trial balance can be computed from the daily balances of
+        trial_balance_temp_account_move_line instead of account_move_line.
+
+        The snapshot only keeps the columns the trial balance groups by, so every domain applied on the journal items
+        must be expressible on them. The amounts are summed before the conversion to the report currency, so the
+        snapshot can only be used when no conversion is needed.
+        """
+        if options.get('analytic_groupby_option') or options.get('analytic_accounts') or report.only_tax_exigible:
+            return False
+
+        company_ids = report.get_report_company_ids(options)
+        if self.env['res.company'].browse(company_ids).currency_id != self.env.company.currency_id:
+            return False
+
+        domain = report._get_options_domain(options, None) + self.env['ir.rule']._compute_domain('account.move.line', 'read')
+        for column_group in options['column_groups'].values():
+            domain += column_group.get('forced_domain') or []
+
+        snapshot_fields = {'company_id', 'account_id', 'journal_id', 'date', 'parent_state', 'display_type'}
+        return all(
+            isinstance(leaf[0], str) and leaf[0].split('.')[0] in snapshot_fields
+            for leaf in domain
+            if expression.is_leaf(leaf)
+        )
+
+    @api.model
+    def _prepare_balance_snapshot(self, report, options):
+        """ Fill trial_balance_temp_account_move_line with the balance of each account per day, journal and state.
+
+        All the column groups of the trial balance (initial balance, periods and end balance) end before the report's
+        date_to, so they can all be computed from this table, which is built with a single scan of account_move_line
+        instead of one per column group.
+        """
+        date_to = max(
+            column_group['forced_options'].get('date', options['date'])['date_to']
+            for column_group in options['column_groups'].values()
+        )
+        parent_states = ('posted', 'draft') if options.get('all_entries') else ('posted',)
+
+        self.env['account.move.line'].flush_model()
+        self.env.cr.execute("""
+            DROP TABLE IF EXISTS trial_balance_temp_account_move_line;
+            CREATE TEMPORARY TABLE trial_balance_temp_account_move_line ON COMMIT DROP AS
+                SELECT
+                    account_move_line.company_id,
+                    account_move_line.account_id,
+                    account_move_line.journal_id,
+                    account_move_line.date,
+                    account_move_line.parent_state,
+                    account_move_line.display_type,
+                    SUM(account_move_line.amount_currency)  AS amount_currency,
+                    SUM(account_move_line.debit)            AS debit,
+                    SUM(account_move_line.credit)           AS credit,
+                    SUM(account_move_line.balance)          AS balance
+                FROM account_move_line
+                WHERE account_move_line.company_id IN %s
+                AND account_move_line.date <= %s
+                AND account_move_line.parent_state IN %s
+                GROUP BY
+                    account_move_line.company_id,
+                    account_move_line.account_id,
+                    account_move_line.journal_id,
+                    account_move_line.date,
+                    account_move_line.parent_state,
+                    account_move_line.display_type;
+            CREATE INDEX ON trial_balance_temp_account_move_line (account_id, date);
+            ANALYZE trial_balance_temp_account_move_line;
+        """, [tuple(report.get_report_company_ids(options)), date_to, parent_states])
+
     def _caret_options_initializer(self):
         return {
             'trial_balance': [
@@ -170,3 +245,4 @@ class TrialBalanceCustomHandler(models.AbstractModel):
                     line['class'] = line_classes + ' o_account_coa_column_contrast_hierarchy'
 
         return lines
+
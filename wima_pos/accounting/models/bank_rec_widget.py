@@ -1,7 +1,8 @@
 
+import copy
 from contextlib import contextmanager
 
-from odoo import _, api, fields, models, Command
+from odoo import _, api, fields, models, tools, Command
 from odoo.addons.web.controllers.utils import clean_action
 from odoo.tools.misc import formatLang
 
@@ -165,14 +166,12 @@ class BankRecWidget(models.Model):
     def _compute_available_reco_model_ids(self):
         for wizard in self:
             if wizard.st_line_id:
-                available_reco_models = self.env['account.reconcile.model'].search([
-                    ('rule_type', '=', 'writeoff_button'),
-                    ('company_id', '=', wizard.st_line_id.company_id.id),
-                    '|',
-                    ('match_journal_ids', '=', False),
-                    ('match_journal_ids', '=', wizard.st_line_id.journal_id.id),
-                ])
-                wizard.available_reco_model_ids = [Command.set(available_reco_models.ids)]
+                available_reco_model_ids = self.env['account.reconcile.model']._get_journal_reconcile_model_ids(
+                    wizard.st_line_id.company_id.id,
+                    wizard.st_line_id.journal_id.id,
+                    True,
+                )
+                wizard.available_reco_model_ids = [Command.set(available_reco_model_ids)]
             else:
                 wizard.available_reco_model_ids = [Command.clear()]
 
@@ -217,9 +216,10 @@ class BankRecWidget(models.Model):
 
     @api.depends('st_line_id')
     def _compute_partner_id(self):
+        partners = self.st_line_id._retrieve_partners()
         for wizard in self:
             if wizard.st_line_id:
-                wizard.partner_id = wizard.st_line_id._retrieve_partner()
+                wizard.partner_id = partners[wizard.st_line_id.id]
             else:
                 wizard.partner_id = None
 
@@ -270,7 +270,28 @@ class BankRecWidget(models.Model):
 
     @api.model
     def fetch_initial_data(self):
-        # Fields.
+        # Fields, copied as they are cached.
+        fields = copy.deepcopy(self._get_initial_fields())
+
+        # Initial values.
+        initial_values = {}
+        for field_name, field in self._fields.items():
+            if field.type == 'one2many':
+                initial_values[field_name] = []
+            else:
+                initial_values[field_name] = field.convert_to_onchange(self[field_name], self, {})
+
+        return {
+            'initial_values': initial_values,
+            'fields': fields,
+        }
+
+    @api.model
+    @tools.ormcache('self.env.lang', 'tuple(self.env.user.groups_id.ids)')
+    def _get_initial_fields(self):
+        """ Describe the fields of the widget and of its lines for the client. The result only depends on the language
+        and the groups of the user, so it's cached instead of being computed each time the widget is loaded.
+        """
         fields = self.fields_get()
         field_attributes = self.env['ir.ui.view']._get_view_field_attributes()
         for field_name, field in self._fields.items():
@@ -288,19 +309,7 @@ class BankRecWidget(models.Model):
                     .fields_get(allfields=['id', 'display_name'], attributes=field_attributes)
 
         fields['todo_command']['onChange'] = True
-
-        # Initial values.
-        initial_values = {}
-        for field_name, field in self._fields.items():
-            if field.type == 'one2many':
-                initial_values[field_name] = []
-            else:
-                initial_values[field_name] = field.convert_to_onchange(self[field_name], self, {})
-
-        return {
-            'initial_values': initial_values,
-            'fields': fields,
-        }
+        return fields
 
     # -------------------------------------------------------------------------
     # LINES METHODS
@@ -714,7 +723,8 @@ class BankRecWidget(models.Model):
 
         line_ids_commands = []
 
-        # Update the base lines.
+        # Update the base lines. Only the lines whose values actually change are updated, to avoid the recomputation of
+        # the fields depending on them.
         for base_line_vals, to_update in tax_results['base_lines_to_update']:
             line = base_line_vals['record']
             amount_currency = to_update['price_subtotal']
@@ -725,6 +735,14 @@ class BankRecWidget(models.Model):
                 balance = self.st_line_id\
                     ._prepare_counterpart_amounts_using_st_line_rate(line.currency_id, line.source_balance, amount_currency)['balance']
 
+            tax_tag_ids = line._fields['tax_tag_ids'].convert_to_cache(to_update['tax_tag_ids'], line)
+            if (
+                line.balance == balance
+                and line.amount_currency == amount_currency
+                and set(line.tax_tag_ids.ids) == set(tax_tag_ids)
+            ):
+                continue
+
             line_ids_commands.append(Command.update(line.id, {
                 'balance': balance,
                 'amount_currency': amount_currency,
@@ -741,21 +759,26 @@ class BankRecWidget(models.Model):
 
         # Update of existing tax lines.
         for tax_line_vals, to_update in tax_results['tax_lines_to_update']:
+            tax_line = tax_line_vals['record']
             new_line_vals = self._lines_prepare_tax_line(to_update)
-            line_ids_commands.append(Command.update(tax_line_vals['record'].id, {
+            if tax_line.amount_currency == new_line_vals['amount_currency'] and tax_line.balance == new_line_vals['balance']:
+                continue
+
+            line_ids_commands.append(Command.update(tax_line.id, {
                 'amount_currency': new_line_vals['amount_currency'],
                 'balance': new_line_vals['balance'],
             }))
 
-        self.line_ids = line_ids_commands
+        if line_ids_commands:
+            self.line_ids = line_ids_commands
 
     def _lines_recompute_exchange_diff(self):
         self.ensure_one()
         line_ids_commands = []
 
-        # Clean the existing lines.
-        for exchange_diff in self.line_ids.filtered(lambda x: x.flag == 'exchange_diff'):
-            line_ids_commands.append(Command.unlink(exchange_diff.id))
+        # The existing lines are kept when still needed, and only updated if their values changed.
+        exchange_diffs = {line.source_aml_id: line for line in self.line_ids.filtered(lambda x: x.flag == 'exchange_diff')}
+        has_new_exchange_diff = False
 
         new_amls = self.line_ids.filtered(lambda x: x.flag == 'new_aml')
         for new_aml in new_amls:
@@ -788,7 +811,10 @@ class BankRecWidget(models.Model):
 
             # Compute the exchange difference balance.
             exchange_diff_balance = balance - new_aml.balance
+            exchange_diff = exchange_diffs.pop(new_aml.source_aml_id, None)
             if self.company_currency_id.is_zero(exchange_diff_balance):
+                if exchange_diff:
+                    line_ids_commands.append(Command.unlink(exchange_diff.id))
                 continue
 
             expense_exchange_account = self.company_id.expense_currency_exchange_account_id
@@ -799,10 +825,7 @@ class BankRecWidget(models.Model):
             else:
                 account = income_exchange_account
 
-            line_ids_commands.append(Command.create({
-                'flag': 'exchange_diff',
-                'source_aml_id': new_aml.source_aml_id.id,
-
+            exchange_diff_vals = {
                 'account_id': account.id,
                 'date': new_aml.date,
                 'name': _("Exchange Difference: %s", new_aml.name),
@@ -810,11 +833,31 @@ class BankRecWidget(models.Model):
                 'currency_id': new_aml.currency_id.id,
                 'amount_currency': exchange_diff_balance if new_aml.currency_id == self.company_currency_id else 0.0,
                 'balance': exchange_diff_balance,
-            }))
+            }
+            if exchange_diff:
+                changed_vals = {
+                    field_name: value
+                    for field_name, value in exchange_diff_vals.items()
+                    if exchange_diff._fields[field_name].convert_to_write(exchange_diff[field_name], exchange_diff) != value
+                }
+                if changed_vals:
+                    line_ids_commands.append(Command.update(exchange_diff.id, changed_vals))
+            else:
+                has_new_exchange_diff = True
+                line_ids_commands.append(Command.create({
+                    'flag': 'exchange_diff',
+                    'source_aml_id': new_aml.source_aml_id.id,
+                    **exchange_diff_vals,
+                }))
+
+        # Clean the lines of the amls no longer in the widget.
+        for exchange_diff in exchange_diffs.values():
+            line_ids_commands.append(Command.unlink(exchange_diff.id))
 
         if line_ids_commands:
             self.line_ids = line_ids_commands
 
+        if has_new_exchange_diff:
             # Reorder to put each exchange line right after the corresponding new_aml.
             new_lines = self.env['bank.rec.widget.line']
             for line in self.line_ids:
@@ -1046,20 +1089,26 @@ class BankRecWidget(models.Model):
     # ACTIONS
     # -------------------------------------------------------------------------
 
-    def _action_trigger_matching_rules(self):
+    def _action_trigger_matching_rules(self, matching=None):
+        """ Apply the reconciliation models to the statement line.
+
+        :param matching: The result of the reconciliation models for the statement line when it is already known,
+                         e.g. computed by account.reconcile.model's _apply_rules_batch.
+        """
         self.ensure_one()
 
         if self.st_line_id.is_reconciled:
             return
 
-        reconcile_models = self.env['account.reconcile.model'].search([
-            ('rule_type', '!=', 'writeoff_button'),
-            ('company_id', '=', self.company_id.id),
-            '|',
-            ('match_journal_ids', '=', False),
-            ('match_journal_ids', '=', self.st_line_id.journal_id.id),
-        ])
-        matching = reconcile_models._apply_rules(self.st_line_id, self.partner_id)
+        if matching is None:
+            reconcile_models = self.env['account.reconcile.model'].browse(
+                self.env['account.reconcile.model']._get_journal_reconcile_model_ids(
+                    self.company_id.id,
+                    self.st_line_id.journal_id.id,
+                    False,
+                )
+            )
+            matching = reconcile_models._apply_rules(self.st_line_id, self.partner_id)
 
         if matching.get('amls'):
             reco_model = matching['model']
@@ -1204,14 +1253,22 @@ class BankRecWidget(models.Model):
         # Focus back the liquidity line.
         self._js_action_mount_line_in_edit(self.line_ids.filtered(lambda x: x.flag == 'liquidity').index)
 
-    def _action_validate(self):
+    def _prepare_validation_values(self):
+        """ Prepare the values needed to validate the statement line of the widget.
+
+        :return: A dictionary containing:
+            * partner:              The partner to set on the statement line and its move.
+            * aml_vals_list:        The values of the journal items replacing the ones of the statement line's move.
+            * to_reconcile:         A list of tuples (index in aml_vals_list, id of the counterpart journal item).
+            * exchange_diff_amounts: A mapping index in aml_vals_list -> the amounts of the exchange difference.
+        """
         self.ensure_one()
         partners = (self.line_ids.filtered(lambda x: x.flag != 'liquidity')).partner_id
         partner_to_set = partners if len(partners) == 1 else self.env['res.partner']
 
         # Prepare the lines to be created.
         to_reconcile = []
-        line_ids_create_command_list = []
+        aml_vals_list = []
         aml_to_exchange_diff_vals = {}
 
         for i, line in enumerate(self.line_ids):
@@ -1221,62 +1278,94 @@ class BankRecWidget(models.Model):
             amount_currency = line.amount_currency
             balance = line.balance
             if line.flag == 'new_aml':
-                to_reconcile.append((i, line.source_aml_id.id))
+                to_reconcile.append((len(aml_vals_list), line.source_aml_id.id))
                 exchange_diff = self.line_ids \
                     .filtered(lambda x: x.flag == 'exchange_diff' and x.source_aml_id == line.source_aml_id)
                 if exchange_diff:
-                    aml_to_exchange_diff_vals[i] = {
+                    aml_to_exchange_diff_vals[len(aml_vals_list)] = {
                         'amount_residual': exchange_diff.balance,
                         'amount_residual_currency': exchange_diff.amount_currency
                     }
                     # Squash amounts of exchange diff into corresponding new_aml
                     amount_currency += exchange_diff.amount_currency
                     balance += exchange_diff.balance
-            line_ids_create_command_list.append(Command.create(line._get_aml_values(
+            aml_vals_list.append(line._get_aml_values(
                 sequence=i,
                 partner_id=partner_to_set.id if line.flag in ('liquidity', 'auto_balance') else line.partner_id.id,
                 amount_currency=amount_currency,
                 balance=balance,
-            )))
+            ))
 
-        st_line = self.st_line_id
-        move = st_line.move_id
+        return {
+            'partner': partner_to_set,
+            'aml_vals_list': aml_vals_list,
+            'to_reconcile': to_reconcile,
+            'exchange_diff_amounts': aml_to_exchange_diff_vals,
+        }
 
-        # Update the move.
-        move_ctx = move.with_context(
+    def _action_validate(self):
+        """ Validate the statement lines of the widgets. Many widgets can be validated at once, in which case the
+        journal items of all the statement lines are replaced in a single create, and the reconciliation is done
+        using a single reconciliation plan.
+        """
+        validation_values_list = [wizard._prepare_validation_values() for wizard in self]
+        st_lines = self.st_line_id
+        moves = st_lines.move_id
+        AccountMoveLine = self.env['account.move.line']
+        aml_ctx = dict(
             skip_invoice_sync=True,
             skip_invoice_line_sync=True,
             skip_account_move_synchronization=True,
             force_delete=True,
         )
-        move_ctx.write({'partner_id': partner_to_set.id, 'line_ids': [Command.clear()] + line_ids_create_command_list})
-        if move_ctx.state == 'draft':
-            move_ctx.action_post()
 
-        AccountMoveLine = self.env['account.move.line']
-        lines = [
-            (move_ctx.line_ids.filtered(lambda x: x.sequence == index),
-             self.env['account.move.line'].browse(counterpart_aml_id))
-            for index, counterpart_aml_id in to_reconcile
-        ]
+        # Update the moves.
+        moves_per_partner = {}
+        for wizard, validation_values in zip(self, validation_values_list):
+            moves_per_partner.setdefault(validation_values['partner'], self.env['account.move'])
+            moves_per_partner[validation_values['partner']] |= wizard.st_line_id.move_id
+        for partner, partner_moves in moves_per_partner.items():
+            partner_moves.with_context(**aml_ctx).write({'partner_id': partner.id})
+
+        moves.line_ids.with_context(**aml_ctx).unlink()
+        aml_vals_list = []
+        for wizard, validation_values in zip(self, validation_values_list):
+            move_id = wizard.st_line_id.move_id.id
+            aml_vals_list += [{**aml_vals, 'move_id': move_id} for aml_vals in validation_values['aml_vals_list']]
+        new_amls = AccountMoveLine.with_context(**aml_ctx).create(aml_vals_list)
+
+        draft_moves = moves.filtered(lambda move: move.state == 'draft')
+        if draft_moves:
+            draft_moves.with_context(**aml_ctx).action_post()
+
+        # Collect the pairs of journal items to reconcile.
+        lines = []
+        lines_exchange_diff_amounts = []
+        offset = 0
+        for validation_values in validation_values_list:
+            for index, counterpart_aml_id in validation_values['to_reconcile']:
+                line = new_amls[offset + index]
+                lines.append((line, AccountMoveLine.browse(counterpart_aml_id)))
+                lines_exchange_diff_amounts.append(validation_values['exchange_diff_amounts'].get(index))
+            offset += len(validation_values['aml_vals_list'])
+
         # Handle exchange diffs
         exchange_diff_moves = None
         lines_with_exch_diff = AccountMoveLine
-        if aml_to_exchange_diff_vals:
-            exchange_diff_vals_list = []
-            for line, counterpart in lines:
-                exchange_diff_amounts = aml_to_exchange_diff_vals.get(line.sequence)
-                if exchange_diff_amounts:
-                    related_exchange_diff_amls = line if exchange_diff_amounts['amount_residual'] * line.amount_residual > 0 else counterpart
-                    exchange_diff_vals_list.append(related_exchange_diff_amls._prepare_exchange_difference_move_vals(
-                        [exchange_diff_amounts],
-                        exchange_date=max(line.date, counterpart.date)
-                    ))
-                    lines_with_exch_diff += line
+        exchange_diff_vals_list = []
+        for (line, counterpart), exchange_diff_amounts in zip(lines, lines_exchange_diff_amounts):
+            if exchange_diff_amounts:
+                related_exchange_diff_amls = line if exchange_diff_amounts['amount_residual'] * line.amount_residual > 0 else counterpart
+                exchange_diff_vals_list.append(related_exchange_diff_amls._prepare_exchange_difference_move_vals(
+                    [exchange_diff_amounts],
+                    exchange_date=max(line.date, counterpart.date)
+                ))
+                lines_with_exch_diff += line
+        if exchange_diff_vals_list:
             exchange_diff_moves = AccountMoveLine._create_exchange_difference_moves(exchange_diff_vals_list)
 
         # Perform the reconciliation.
-        self.env['account.move.line'].with_context(no_exchange_difference=True)._reconcile_plan(
+        AccountMoveLine.with_context(no_exchange_difference=True)._reconcile_plan(
             [line + counterpart for line, counterpart in lines])
 
         # Assign exchange move to partials.
@@ -1284,16 +1373,21 @@ class BankRecWidget(models.Model):
             (line.matched_debit_ids + line.matched_credit_ids).exchange_move_id = exchange_diff_moves[index]
 
         # Fill missing partner.
-        st_line_ctx = st_line.with_context(skip_account_move_synchronization=True)
-        st_line_ctx.partner_id = partner_to_set
+        st_lines_per_partner = {}
+        for wizard, validation_values in zip(self, validation_values_list):
+            st_lines_per_partner.setdefault(validation_values['partner'], self.env['account.bank.statement.line'])
+            st_lines_per_partner[validation_values['partner']] |= wizard.st_line_id
+        for partner, partner_st_lines in st_lines_per_partner.items():
+            partner_st_lines.with_context(skip_account_move_synchronization=True).partner_id = partner
 
         # Create missing partner bank if necessary.
-        if st_line.account_number and st_line.partner_id and not st_line.partner_bank_id:
-            st_line_ctx.partner_bank_id = st_line._find_or_create_bank_account()
+        for st_line in st_lines:
+            if st_line.account_number and st_line.partner_id and not st_line.partner_bank_id:
+                st_line.with_context(skip_account_move_synchronization=True).partner_bank_id = st_line._find_or_create_bank_account()
 
         # Refresh analytic lines.
-        move.line_ids.analytic_line_ids.unlink()
-        move.line_ids._create_analytic_lines()
+        moves.line_ids.analytic_line_ids.unlink()
+        moves.line_ids._create_analytic_lines()
 
     @contextmanager
     def _action_validate_method(self):
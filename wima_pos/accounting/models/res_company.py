@@ -1,8 +1,9 @@
 
 
 from odoo import models, fields, api, _
-from odoo.tools.misc import DEFAULT_SERVER_DATE_FORMAT
+from odoo.tools import ormcache
 from odoo.exceptions import UserError
+import bisect
 import itertools
 
 from datetime import timedelta
@@ -156,6 +157,34 @@ class ResCompany(models.Model):
 
         return rslt
 
+    @ormcache('self.id')
+    def _get_fiscalyear_intervals(self):
+        """Get the fiscal year records of the company, sorted by date.
+
+        The result is cached per company and invalidated when a fiscal year is created, written or deleted.
+
+        :return: A tuple (date_froms, fiscalyears) where fiscalyears is a tuple of (date_from, date_to, fiscal year id)
+                 and date_froms their starting dates, to bisect on.
+        """
+        self.ensure_one()
+        fiscalyears = self.env['account.fiscal.year'].sudo().search_read(
+            [('company_id', '=', self.id)],
+            ['date_from', 'date_to'],
+            order='date_from',
+        )
+        intervals = tuple((fiscalyear['date_from'], fiscalyear['date_to'], fiscalyear['id']) for fiscalyear in fiscalyears)
+        return tuple(interval[0] for interval in intervals), intervals
+
+    def _get_fiscalyear_interval(self, date):
+        """Get the (date_from, date_to, fiscal year id) of the fiscal year record of the company containing the date, if any."""
+        if isinstance(date, _datetime.datetime):
+            date = date.date()
+        date_froms, intervals = self._get_fiscalyear_intervals()
+        index = bisect.bisect_right(date_froms, date) - 1
+        if index >= 0 and intervals[index][1] >= date:
+            return intervals[index]
+        return None
+
     def compute_fiscalyear_dates(self, current_date):
         """Compute the start and end dates of the fiscal year where the given 'date' belongs to.
 
@@ -166,48 +195,32 @@ class ResCompany(models.Model):
             * [Optionally] record: The fiscal year record.
         """
         self.ensure_one()
-        date_str = current_date.strftime(DEFAULT_SERVER_DATE_FORMAT)
 
         # Search a fiscal year record containing the date.
         # If a record is found, then no need further computation, we get the dates range directly.
-        fiscalyear = self.env['account.fiscal.year'].search([
-            ('company_id', '=', self.id),
-            ('date_from', '<=', date_str),
-            ('date_to', '>=', date_str),
-        ], limit=1)
+        fiscalyear = self._get_fiscalyear_interval(current_date)
         if fiscalyear:
             return {
-                'date_from': fiscalyear.date_from,
-                'date_to': fiscalyear.date_to,
-                'record': fiscalyear,
+                'date_from': fiscalyear[0],
+                'date_to': fiscalyear[1],
+                'record': self.env['account.fiscal.year'].browse(fiscalyear[2]),
             }
 
         date_from, date_to = date_utils.get_fiscal_year(
             current_date, day=self.fiscalyear_last_day, month=int(self.fiscalyear_last_month))
 
-        date_from_str = date_from.strftime(DEFAULT_SERVER_DATE_FORMAT)
-        date_to_str = date_to.strftime(DEFAULT_SERVER_DATE_FORMAT)
-
         # Search for fiscal year records reducing the delta between the date_from/date_to.
         # This case could happen if there is a gap between two fiscal year records.
         # E.g. two fiscal year records: 2017-01-01 -> 2017-02-01 and 2017-03-01 -> 2017-12-31.
         # => The period 2017-02-02 - 2017-02-30 is not covered by a fiscal year record.
 
-        fiscalyear_from = self.env['account.fiscal.year'].search([
-            ('company_id', '=', self.id),
-            ('date_from', '<=', date_from_str),
-            ('date_to', '>=', date_from_str),
-        ], limit=1)
+        fiscalyear_from = self._get_fiscalyear_interval(date_from)
         if fiscalyear_from:
-            date_from = fiscalyear_from.date_to + timedelta(days=1)
+            date_from = fiscalyear_from[1] + timedelta(days=1)
 
-        fiscalyear_to = self.env['account.fiscal.year'].search([
-            ('company_id', '=', self.id),
-            ('date_from', '<=', date_to_str),
-            ('date_to', '>=', date_to_str),
-        ], limit=1)
+        fiscalyear_to = self._get_fiscalyear_interval(date_to)
         if fiscalyear_to:
-            date_to = fiscalyear_to.date_from - timedelta(days=1)
+            date_to = fiscalyear_to[0] - timedelta(days=1)
 
         return {'date_from': date_from, 'date_to': date_to}
 
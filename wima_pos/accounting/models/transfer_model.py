@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
+from collections import defaultdict
 from datetime import date
 
 from dateutil.relativedelta import relativedelta
@@ -118,6 +119,11 @@ class TransferModel(models.Model):
 
     def action_perform_auto_transfer(self):
         """ Perform the automatic transfer for the current recordset of models  """
+        # Fetch the draft moves of all the models at once, rather than searching them period by period
+        draft_moves_by_model = defaultdict(dict)
+        for move in self.env['account.move'].search([('transfer_model_id', 'in', self.ids), ('state', '=', 'draft')], order='date desc'):
+            draft_moves_by_model[move.transfer_model_id.id].setdefault(move.date, move)
+
         for record in self:
             # If no account to ventilate or no account to ventilate into : nothing to do
             if record.account_ids and record.line_ids:
@@ -125,19 +131,20 @@ class TransferModel(models.Model):
                 max_date = record.date_stop and min(today, record.date_stop) or today
                 start_date = record._determine_start_date()
                 next_move_date = record._get_next_move_date(start_date)
+                draft_moves = draft_moves_by_model[record.id]
 
                 # (Re)Generate moves in draft untill today
                 # Journal entries will be recomputed everyday until posted.
                 while next_move_date <= max_date:
-                    record._create_or_update_move_for_period(start_date, next_move_date)
+                    record._create_or_update_move_for_period(start_date, next_move_date, draft_moves=draft_moves)
                     start_date = next_move_date + relativedelta(days=1)
                     next_move_date = record._get_next_move_date(start_date)
 
                 # (Re)Generate move for one more period if needed
                 if not record.date_stop:
-                    record._create_or_update_move_for_period(start_date, next_move_date)
+                    record._create_or_update_move_for_period(start_date, next_move_date, draft_moves=draft_moves)
                 elif today < record.date_stop:
-                    record._create_or_update_move_for_period(start_date, min(next_move_date, record.date_stop))
+                    record._create_or_update_move_for_period(start_date, min(next_move_date, record.date_stop), draft_moves=draft_moves)
         return False
 
     def _get_move_lines_base_domain(self, start_date, end_date):
@@ -158,17 +165,25 @@ class TransferModel(models.Model):
 
     # PROTECTEDS
 
-    def _create_or_update_move_for_period(self, start_date, end_date):
+    def _create_or_update_move_for_period(self, start_date, end_date, draft_moves=None):
         """
         Create or update a move for a given period. This means (re)generates all the needed moves to execute the
         transfers
         :param start_date: the start date of the targeted period
         :param end_date: the end date of the targeted period
+        :param draft_moves: if given, a dictionary mapping the dates to the draft moves of this model, used instead
+                            of searching the move of the period
         :return: the created (or updated) move
         """
         self.ensure_one()
-        current_move = self._get_move_for_period(end_date)
+        if draft_moves is None:
+            current_move = self._get_move_for_period(end_date)
+        else:
+            current_move = draft_moves.get(end_date)
         line_values = self._get_auto_transfer_move_line_values(start_date, end_date)
+        if current_move is not None and not self._is_transfer_move_outdated(current_move, line_values):
+            # Nothing changed since the last run, don't rewrite the lines of the move
+            return current_move
         if line_values:
             if current_move is None:
                 current_move = self.env['account.move'].create({
@@ -185,6 +200,34 @@ class TransferModel(models.Model):
             current_move.write({'line_ids': line_ids_values})
         return current_move
 
+    def _is_transfer_move_outdated(self, move, line_values):
+        """ Check whether the lines of a generated move differ from the values of the lines to generate
+        :param move: the draft move generated for the period
+        :param line_values: the values of the move lines to generate, as returned by _get_auto_transfer_move_line_values
+        :return: True if the lines of the move need to be regenerated
+        :rtype: bool
+        """
+        self.ensure_one()
+        currency = move.company_id.currency_id
+
+        def line_key(name, account_id, date_maturity, balance):
+            return name, account_id, date_maturity, currency.round(balance)
+
+        existing_keys = sorted(
+            (line_key(line.name, line.account_id.id, line.date_maturity, line.balance) for line in move.line_ids),
+            key=str,
+        )
+        new_keys = sorted(
+            (line_key(
+                values['name'],
+                values['account_id'],
+                values['date_maturity'],
+                values.get('debit', 0.0) - values.get('credit', 0.0),
+            ) for values in line_values),
+            key=str,
+        )
+        return existing_keys != new_keys
+
     def _get_move_for_period(self, end_date):
         """ Get the generated move for a given period
         :param end_date: the end date of the wished period, do not need the start date as the move will always be
@@ -2,6 +2,10 @@ from datetime import date
 
 from odoo import api, Command, fields, models, _
 from odoo.exceptions import UserError
+from odoo.tools import split_every
+
+# Number of reconciliation plans given at once to _reconcile_plan.
+AUTO_RECONCILE_BATCH_SIZE = 1000
 
 
 class AccountAutoReconcileWizard(models.TransientModel):
@@ -106,58 +110,108 @@ class AccountAutoReconcileWizard(models.TransientModel):
                     domain.append(('partner_id', 'in', self.partner_ids.ids))
         return domain
 
-    def _auto_reconcile_one_to_one(self):
+    def _get_one_to_one_plans(self):
+        """ Pair the amls to reconcile with the one-to-one strategy. Among the amls sharing the same account, partner,
+        currency and absolute residual amount, the n-th oldest positive aml is paired with the n-th oldest negative one.
+        :return: a list of [positive aml id, negative aml id]
+        """
+        self.env['account.move.line'].flush_model()
+        query = self.env['account.move.line']._where_calc(self._get_amls_domain())
+        tables, where_clause, where_params = query.get_sql()
+        self._cr.execute(f'''
+            WITH numbered_amls AS (
+                SELECT
+                    account_move_line.id,
+                    account_move_line.account_id,
+                    account_move_line.partner_id,
+                    account_move_line.currency_id,
+                    ROUND(ABS(account_move_line.amount_residual_currency), currency.decimal_places) AS amount,
+                    account_move_line.amount_residual_currency >= 0 AS is_positive,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY
+                            account_move_line.account_id,
+                            account_move_line.partner_id,
+                            account_move_line.currency_id,
+                            ROUND(ABS(account_move_line.amount_residual_currency), currency.decimal_places),
+                            account_move_line.amount_residual_currency >= 0
+                        ORDER BY account_move_line.date, account_move_line.id
+                    ) AS rank
+                FROM {tables}
+                JOIN res_currency currency ON currency.id = account_move_line.currency_id
+                WHERE {where_clause}
+            )
+            SELECT positive_aml.id, negative_aml.id
+            FROM numbered_amls positive_aml
+            JOIN numbered_amls negative_aml
+                ON negative_aml.account_id = positive_aml.account_id
+                AND negative_aml.partner_id IS NOT DISTINCT FROM positive_aml.partner_id
+                AND negative_aml.currency_id = positive_aml.currency_id
+                AND negative_aml.amount = positive_aml.amount
+                AND negative_aml.rank = positive_aml.rank
+            WHERE positive_aml.is_positive AND NOT negative_aml.is_positive
+        ''', where_params)
+        return [list(aml_ids) for aml_ids in self._cr.fetchall()]
+
+    def _auto_reconcile_one_to_one(self, commit=False):
         """ Auto-reconcile with one-to-one strategy:
         We will reconcile 2 amls together if their combined balance is zero.
+        :param commit: commit after each batch of reconciliations, when running in background.
         :return: a recordset of reconciled amls
         """
-        grouped_amls_data = self.env['account.move.line']._read_group(
-            self._get_amls_domain(),
-            ['account_id', 'partner_id', 'currency_id', 'amount_residual_currency:abs_rounded'],
-            ['id:recordset'],
-        )
-        all_reconciled_amls = self.env['account.move.line']
-        amls_grouped_by_2 = []  # we need to group amls with right format for _reconcile_plan
-        for *__, grouped_aml_ids in grouped_amls_data:
-            positive_amls = grouped_aml_ids.filtered(lambda aml: aml.amount_residual_currency >= 0).sorted('date')
-            negative_amls = (grouped_aml_ids - positive_amls).sorted('date')
-            min_len = min(len(positive_amls), len(negative_amls))
-            positive_amls = positive_amls[:min_len]
-            negative_amls = negative_amls[:min_len]
-            all_reconciled_amls += positive_amls + negative_amls
-            amls_grouped_by_2 += [pos_aml + neg_aml for (pos_aml, neg_aml) in zip(positive_amls, negative_amls)]
-        self.env['account.move.line']._reconcile_plan(amls_grouped_by_2)
-        return all_reconciled_amls
-
-    def _auto_reconcile_zero_balance(self):
+        plans = self._get_one_to_one_plans()
+        self._reconcile_plans_by_batch(plans, commit=commit)
+        return self.env['account.move.line'].browse(aml_id for aml_ids in plans for aml_id in aml_ids)
+
+    def _auto_reconcile_zero_balance(self, commit=False):
         """ Auto-reconcile with zero balance strategy:
         We will reconcile all amls grouped by currency/account/partner that have a total balance of zero.
+        :param commit: commit after each batch of reconciliations, when running in background.
         :return: a recordset of reconciled amls
         """
         grouped_amls_data = self.env['account.move.line']._read_group(
             self._get_amls_domain(),
             groupby=['account_id', 'partner_id', 'currency_id'],
-            aggregates=['id:recordset'],
+            aggregates=['id:array_agg'],
             having=[('amount_residual_currency:sum_rounded', '=', 0)],
         )
-        all_reconciled_amls = self.env['account.move.line']
-        amls_grouped_together = []  # we need to group amls with right format for _reconcile_plan
-        for aml_data in grouped_amls_data:
-            all_reconciled_amls += aml_data[-1]
-            amls_grouped_together += [aml_data[-1]]
-        self.env['account.move.line']._reconcile_plan(amls_grouped_together)
-        return all_reconciled_amls
+        plans = [aml_data[-1] for aml_data in grouped_amls_data]
+        self._reconcile_plans_by_batch(plans, commit=commit)
+        return self.env['account.move.line'].browse(aml_id for aml_ids in plans for aml_id in aml_ids)
+
+    def _reconcile_plans_by_batch(self, plans, commit=False):
+        """ Reconcile the given plans by batches of AUTO_RECONCILE_BATCH_SIZE plans.
+        :param plans: a list of lists of aml ids to reconcile together.
+        :param commit: commit after each batch and clear the cache, when running in background.
+        """
+        for batch in split_every(AUTO_RECONCILE_BATCH_SIZE, plans):
+            batch_amls = self.env['account.move.line'].browse(aml_id for aml_ids in batch for aml_id in aml_ids)
+            batch_plans = [batch_amls.browse(aml_ids).with_prefetch(batch_amls._prefetch_ids) for aml_ids in batch]
+            if commit:
+                # Some amls may have been reconciled by someone else since the previous batch.
+                batch_plans = [plan for plan in batch_plans if not any(plan.mapped('reconciled'))]
+            if batch_plans:
+                self.env['account.move.line']._reconcile_plan(batch_plans)
+            if commit:
+                self.env.cr.commit()
+                self.env.invalidate_all()
+
+    def _auto_reconcile_amls(self, commit=False):
+        """ Reconcile the amls according to the search mode of the wizard.
+        :param commit: commit after each batch of reconciliations, when running in background.
+        :return: a recordset of reconciled amls
+        """
+        self.ensure_one()
+        if self.search_mode == 'zero_balance':
+            return self._auto_reconcile_zero_balance(commit=commit)
+        # search_mode == 'one_to_one'
+        return self._auto_reconcile_one_to_one(commit=commit)
 
     def auto_reconcile(self):
         """ Automatically reconcile amls given wizard's parameters.
         :return: an action that opens all reconciled items and related amls (exchange diff, etc)
         """
         self.ensure_one()
-        if self.search_mode == 'zero_balance':
-            reconciled_amls = self._auto_reconcile_zero_balance()
-        else:
-            # search_mode == 'one_to_one'
-            reconciled_amls = self._auto_reconcile_one_to_one()
+        reconciled_amls = self._auto_reconcile_amls()
         reconciled_amls_and_related = self.env['account.move.line'].search([
             ('full_reconcile_id', 'in', reconciled_amls.full_reconcile_id.ids)
         ])
@@ -172,3 +226,24 @@ class AccountAutoReconcileWizard(models.TransientModel):
             }
         else:
             raise UserError("Nothing to reconcile.")
+
+    def action_auto_reconcile_in_background(self):
+        """ Let the CRON reconcile the amls given wizard's parameters, committing after each batch.
+        Meant for large volumes of amls that can't be reconciled within a single request.
+        """
+        self.ensure_one()
+        self.env['account.auto.reconcile.job'].create({
+            'company_id': self.company_id.id,
+            'line_ids': [Command.set(self.line_ids.ids)],
+            **self._get_wizard_values(),
+        })
+        self.env.ref('wima_pos.ir_cron_auto_reconcile_wizard')._trigger()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'info',
+                'message': _("The entries will be reconciled in the background."),
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
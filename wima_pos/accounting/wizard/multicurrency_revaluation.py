@@ -105,33 +105,13 @@ class MulticurrencyRevaluationWizard(models.TransientModel):
 
     @api.model
     def _get_move_vals(self):
-        def _get_model_id(parsed_line, selected_model):
-            for dummy, parsed_res_model, parsed_res_id in parsed_line:
-                if parsed_res_model == selected_model:
-                    return parsed_res_id
-
-        def _get_adjustment_balance(line):
-            for column in line.get('columns'):
-                if column.get('expression_label') == 'adjustment':
-                    return column.get('no_format')
-
         report = self.env.ref('wima_pos.multicurrency_revaluation_report')
-        included_line_id = report.line_ids.filtered(lambda l: l.code == 'multicurrency_included').id
-        generic_included_line_id = report._get_generic_line_id('account.report.line', included_line_id)
-        options = {**self._context['multicurrency_revaluation_report_options'], 'unfold_all': False}
-        report_lines = report._get_lines(options)
+        options = self._context['multicurrency_revaluation_report_options']
+        adjustments = self.env['account.multicurrency.revaluation.report.handler']._get_multi_currency_revaluation_adjustments(report, options)
         move_lines = []
 
-        for report_line in report._get_unfolded_lines(report_lines, generic_included_line_id):
-            parsed_line_id = report._parse_line_id(report_line.get('id'))
-            balance = _get_adjustment_balance(report_line)
-            # parsed_line_id[-1][-2] corresponds to res_model of the current line
-            if (
-                parsed_line_id[-1][-2] == 'account.account'
-                and not self.env.company.currency_id.is_zero(balance)
-            ):
-                account_id = _get_model_id(parsed_line_id, 'account.account')
-                currency_id = _get_model_id(parsed_line_id, 'res.currency')
+        for currency_id, account_id, balance in adjustments:
+            if not self.env.company.currency_id.is_zero(balance):
                 move_lines.append(Command.create({
                     'name': _(
                         "Provision for %(for_cur)s (1 %(comp_cur)s = %(rate)s %(for_cur)s)",